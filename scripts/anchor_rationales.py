@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Fill ``bookAnchor`` on staged rationales from the NBCOT source collection.
+
+Question stems are read from ``questions.draft.json`` in a staging directory
+(e.g. ``data/staging/otr4``), embedded in one batch with the same MiniLM model
+used by ``ingest_nbcot_qdrant.py``, and searched against the ``nbcot_sources``
+collection with batched Qdrant queries. The top chunks for each question are
+written back into ``rationales/q-XXX.json``: the best hit becomes the
+``bookAnchor`` and the full list is kept under ``bookAnchorCandidates``.
+
+Search results are cached by a hash of the normalised stem, so re-running
+after a rationale edit only queries questions whose stems changed. The cache
+knows nothing about the collection's contents: after a re-ingest, pass
+``--refresh`` to search every pending stem again.
+
+With ``--prefilter N`` each dense query is restricted to the ``N`` best BM25
+matches from the local sparse index (see ``sparse_index.py``), so stems that
+name a specific assessment or diagnosis are anchored to chunks that mention it.
+With ``--hybrid`` each query also runs a BM25 search over the collection's
+``bm25`` sparse vectors (ingested with ``--sparse``) and the two result lists
+are merged with reciprocal rank fusion; anchor scores are then RRF scores.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from sparse_index import DEFAULT_INDEX_PATH, SPARSE_VECTOR_NAME, SparseIndex
+from text_normalization import normalize_text
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+EXCERPT_LENGTH = 280
+# Bump when the anchor dict written by hit_to_anchor changes, so cached anchors are not reused.
+ANCHOR_FORMAT = 2
+# Each side of a hybrid query contributes this many times top_k candidates to the fusion.
+HYBRID_PREFETCH_FACTOR = 4
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--staging-dir",
+        type=Path,
+        default=Path("data/staging/otr4"),
+        help="Staging directory containing questions.draft.json and rationales/ (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--collection",
+        default="nbcot_sources",
+        help="Qdrant collection to search (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--qdrant-url",
+        default=os.environ.get("QDRANT_URL", "http://localhost:6333"),
+        help="Qdrant HTTP endpoint (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=3,
+        help="Source chunks to keep per question (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Queries per batched search request (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=None,
+        help="Result cache file. Defaults to <staging-dir>/anchor-cache.json.",
+    )
+    parser.add_argument(
+        "--projection",
+        type=Path,
+        default=None,
+        help="Projection file the collection was ingested with (see vector_compression.py).",
+    )
+    parser.add_argument(
+        "--vector-datatype",
+        choices=("float32", "float16", "uint8"),
+        default="float32",
+        help="Datatype the collection stores vectors as (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        type=int,
+        default=0,
+        help="Restrict dense search to this many BM25 candidates per stem; 0 disables (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--hybrid",
+        action="store_true",
+        help=f"Fuse dense search with BM25 over the collection's '{SPARSE_VECTOR_NAME}' sparse vectors (RRF).",
+    )
+    parser.add_argument(
+        "--sparse-index",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="Local sparse index used by --prefilter and --hybrid (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Replace bookAnchor values that are already set.",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached search results (e.g. after re-ingesting the collection); the cache is rewritten.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Search and report, but do not modify rationale files.",
+    )
+    return parser.parse_args()
+
+
+def stem_hash(stem: str, collection: str, top_k: int, encoding: str = "") -> str:
+    key = f"{ANCHOR_FORMAT}|{EMBEDDING_MODEL}|{collection}|{top_k}|{encoding}|{stem}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def load_cache(path: Path) -> Dict[str, List[dict]]:
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_cache(path: Path, cache: Dict[str, List[dict]]) -> None:
+    path.write_text(json.dumps(cache, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+def load_stems(staging_dir: Path) -> Dict[int, str]:
+    draft_path = staging_dir / "questions.draft.json"
+    with draft_path.open("r", encoding="utf-8") as f:
+        draft = json.load(f)
+    stems: Dict[int, str] = {}
+    for question in draft.get("questions", []):
+        text = question.get("sanitizedPrompt") or question.get("prompt") or ""
+        if text.strip():
+            stems[int(question["order"])] = " ".join(normalize_text(text).split())
+    return stems
+
+
+def build_embedder():
+    try:
+        from sentence_transformers import SentenceTransformer  # type: ignore
+    except ImportError as exc:  # pragma: no cover - handled at runtime
+        raise RuntimeError("sentence-transformers is required to embed question stems.") from exc
+    print(f"Loading sentence-transformer model '{EMBEDDING_MODEL}'...")
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+def hit_to_anchor(hit) -> dict:
+    payload = hit.payload or {}
+    chunk_index = payload.get("chunk_index")
+    if chunk_index is None:
+        chunk_index = payload.get("chunk_meta_chunk_index")
+    source_file = payload.get("source_file")
+    # meta_source is a folder label ("NBCOT_Test_Files") in the embedded chunk files; the filename names the book.
+    title = payload.get("meta_filename") or payload.get("meta_source") or source_file or "Unknown source"
+    return {
+        "title": Path(str(title)).stem,
+        "excerpt": " ".join(str(payload.get("text", "")).split())[:EXCERPT_LENGTH],
+        "source": source_file,
+        "source_file": source_file,
+        "chunk_index": chunk_index,
+        "page_number": payload.get("chunk_meta_page_number"),
+        "score": round(float(hit.score), 4),
+    }
+
+
+def search_batched(
+    client: QdrantClient,
+    collection: str,
+    vectors: List[List[float]],
+    top_k: int,
+    batch_size: int,
+    filters: Optional[Sequence[Optional[qmodels.Filter]]] = None,
+    sparse_queries: Optional[Sequence[Optional[qmodels.SparseVector]]] = None,
+) -> List[List[dict]]:
+    """Run one batched request per ``batch_size`` vectors and return anchors per query."""
+    results: List[List[dict]] = []
+    filters = filters or [None] * len(vectors)
+    sparse_queries = sparse_queries or [None] * len(vectors)
+    if not hasattr(client, "query_batch_points") and any(q is not None for q in sparse_queries):
+        raise SystemExit("--hybrid needs qdrant-client >= 1.10 (query_batch_points).")
+    for start in range(0, len(vectors), batch_size):
+        stop = start + batch_size
+        chunk = list(zip(vectors[start:stop], filters[start:stop], sparse_queries[start:stop]))
+        if hasattr(client, "query_batch_points"):
+            responses = client.query_batch_points(
+                collection_name=collection,
+                requests=[query_request(vector, query_filter, sparse, top_k) for vector, query_filter, sparse in chunk],
+            )
+            batches = [response.points for response in responses]
+        else:  # qdrant-client < 1.10
+            batches = client.search_batch(
+                collection_name=collection,
+                requests=[
+                    qmodels.SearchRequest(vector=vector, filter=query_filter, limit=top_k, with_payload=True)
+                    for vector, query_filter, _ in chunk
+                ],
+            )
+        results.extend([hit_to_anchor(hit) for hit in hits] for hits in batches)
+    return results
+
+
+def query_request(
+    vector: List[float],
+    query_filter: Optional[qmodels.Filter],
+    sparse: Optional[qmodels.SparseVector],
+    top_k: int,
+) -> qmodels.QueryRequest:
+    """Dense query, or a dense + BM25 prefetch fused with RRF when ``sparse`` is given."""
+    if sparse is None:
+        return qmodels.QueryRequest(query=vector, filter=query_filter, limit=top_k, with_payload=True)
+    candidates = top_k * HYBRID_PREFETCH_FACTOR
+    return qmodels.QueryRequest(
+        prefetch=[
+            qmodels.Prefetch(query=vector, filter=query_filter, limit=candidates),
+            qmodels.Prefetch(query=sparse, using=SPARSE_VECTOR_NAME, filter=query_filter, limit=candidates),
+        ],
+        query=qmodels.FusionQuery(fusion=qmodels.Fusion.RRF),
+        limit=top_k,
+        with_payload=True,
+    )
+
+
+def sparse_query_for(index: SparseIndex, stem: str) -> Optional[qmodels.SparseVector]:
+    indices, values = index.query_vector(stem)
+    return qmodels.SparseVector(indices=indices, values=values) if indices else None
+
+
+def prefilter_for(index: SparseIndex, stem: str, limit: int) -> Optional[qmodels.Filter]:
+    """Restrict a dense query to the stem's BM25 candidates (``None`` when no term is known)."""
+    candidates = index.candidate_ids(stem, limit)
+    if not candidates:
+        return None
+    return qmodels.Filter(must=[qmodels.HasIdCondition(has_id=candidates)])
+
+
+def main() -> None:
+    args = parse_args()
+    staging_dir: Path = args.staging_dir
+    rationale_dir = staging_dir / "rationales"
+    if not rationale_dir.exists():
+        raise SystemExit(f"Rationale directory not found: {rationale_dir}")
+
+    stems = load_stems(staging_dir)
+    cache_path: Path = args.cache or (staging_dir / "anchor-cache.json")
+    cache = load_cache(cache_path)
+
+    pending: Dict[int, Path] = {}
+    for path in sorted(rationale_dir.glob("q-*.json")):
+        order = int(path.stem.split("-")[1])
+        if order not in stems:
+            print(f"Skipping {path.name}: no stem in questions.draft.json")
+            continue
+        with path.open("r", encoding="utf-8") as f:
+            rationale = json.load(f)
+        if rationale.get("bookAnchor") and not args.overwrite:
+            continue
+        pending[order] = path
+
+    if not pending:
+        print("All rationales already have a bookAnchor; use --overwrite to refresh.")
+        return
+
+    encoding = f"{args.projection.name}:{args.vector_datatype}" if args.projection else ""
+    if args.prefilter:
+        encoding += f"|bm25:{args.prefilter}"
+    if args.hybrid:
+        encoding += "|hybrid"
+    keys = {order: stem_hash(stems[order], args.collection, args.top_k, encoding) for order in pending}
+    misses = sorted({keys[order] for order in pending if args.refresh or keys[order] not in cache})
+    if misses:
+        stem_by_key = {keys[order]: stems[order] for order in pending}
+        embedder = build_embedder()
+        embedded = embedder.encode(
+            [stem_by_key[key] for key in misses],
+            batch_size=args.batch_size,
+            normalize_embeddings=True,
+        )
+        if args.projection is not None:
+            from vector_compression import VectorProjection
+
+            embedded = VectorProjection.load(args.projection).prepare(embedded, args.vector_datatype)
+        vectors = embedded.tolist()
+        filters = sparse_queries = None
+        if args.prefilter or args.hybrid:
+            if not args.sparse_index.exists():
+                raise SystemExit(f"Sparse index not found: {args.sparse_index} (run scripts/sparse_index.py update)")
+            index = SparseIndex.load(args.sparse_index)
+            if args.prefilter:
+                filters = [prefilter_for(index, stem_by_key[key], args.prefilter) for key in misses]
+            if args.hybrid:
+                sparse_queries = [sparse_query_for(index, stem_by_key[key]) for key in misses]
+        client = QdrantClient(url=args.qdrant_url)
+        anchors = search_batched(
+            client, args.collection, vectors, args.top_k, args.batch_size, filters, sparse_queries
+        )
+        cache.update(zip(misses, anchors))
+        round_trips = (len(misses) + args.batch_size - 1) // args.batch_size
+        print(f"Searched {len(misses)} stems in {round_trips} batched request(s).")
+        if not args.dry_run:
+            save_cache(cache_path, cache)
+
+    anchored = 0
+    for order, path in sorted(pending.items()):
+        candidates = cache.get(keys[order]) or []
+        best: Optional[dict] = candidates[0] if candidates else None
+        if best is None:
+            print(f"No source chunks found for {path.name}")
+            continue
+        anchored += 1
+        if args.dry_run:
+            print(f"{path.name}: {best['title']} (chunk {best['chunk_index']}, score {best['score']})")
+            continue
+        with path.open("r", encoding="utf-8") as f:
+            rationale = json.load(f)
+        rationale["bookAnchor"] = best
+        rationale["bookAnchorCandidates"] = candidates
+        path.write_text(json.dumps(rationale, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    action = "Would anchor" if args.dry_run else "Anchored"
+    print(f"{action} {anchored} of {len(pending)} rationales from collection '{args.collection}'.")
+
+
+if __name__ == "__main__":
+    main()
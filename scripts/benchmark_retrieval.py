@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Benchmark latency and recall of the NBCOT source collection settings.
+
+Chunk embeddings are loaded from the ``*_chunks.json`` files that
+``ingest_nbcot_qdrant.py`` ingests, and a query set is built either from
+practice question stems (embedded with MiniLM) or from a held-out sample of
+chunk vectors (``--queries chunks``, or automatically when
+sentence-transformers is not installed). Exact top-k ground truth is computed
+by brute force with NumPy.
+
+Each combination of HNSW ``m`` / ``ef_construct`` and scalar quantization
+gets a scratch collection; every search-time ``hnsw_ef`` and batch size is
+then timed against it. Results are reported as recall@k, p50/p95/p99 request
+latency, QPS and an estimate of the index size, both as a table and as JSON.
+
+Without ``--qdrant-url`` the benchmark runs against Qdrant local mode, which
+always searches exhaustively; HNSW and quantization parameters only change
+the numbers when pointed at a Qdrant server.
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+from find_duplicate_questions import DEFAULT_QUESTION_FILES
+from ingest_nbcot_qdrant import iter_chunk_files, load_chunks
+from text_normalization import normalize_text
+from vector_compression import normalise_rows
+
+
+def int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path("data/nbcot-sources"),
+        help="Directory containing *_chunks.json files (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--qdrant-url",
+        default=None,
+        help="Qdrant HTTP endpoint. Omit to benchmark Qdrant local mode in memory.",
+    )
+    parser.add_argument(
+        "--queries",
+        choices=("stems", "chunks"),
+        default="stems",
+        help="Query source: embedded question stems or held-out chunk vectors (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--num-queries",
+        type=int,
+        default=200,
+        help="Maximum number of queries (default: %(default)s)",
+    )
+    parser.add_argument("--k", type=int, default=10, help="Recall cutoff (default: %(default)s)")
+    parser.add_argument("--m", type=int_list, default=[8, 16, 32], help="HNSW m values (default: 8,16,32)")
+    parser.add_argument(
+        "--ef-construct",
+        type=int_list,
+        default=[64, 128],
+        help="HNSW ef_construct values (default: 64,128)",
+    )
+    parser.add_argument(
+        "--ef",
+        type=int_list,
+        default=[16, 64, 128],
+        help="Search-time hnsw_ef values (default: 16,64,128)",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int_list,
+        default=[1, 16],
+        help="Queries per search request (default: 1,16)",
+    )
+    parser.add_argument(
+        "--quantization",
+        choices=("off", "on", "both"),
+        default="both",
+        help="Benchmark without, with, or both with and without int8 scalar quantization (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--full-scan-threshold",
+        type=int,
+        default=10,
+        help="HNSW full_scan_threshold (KB); kept low so small corpora still use the graph (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Timed passes over the query set per configuration (default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=7, help="Sampling seed (default: %(default)s)")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Optional path for the JSON results.",
+    )
+    return parser.parse_args()
+
+
+def load_corpus(data_dir: Path) -> Tuple[np.ndarray, List[str]]:
+    vectors: List[List[float]] = []
+    labels: List[str] = []
+    for path in iter_chunk_files(data_dir):
+        _, chunks = load_chunks(path)
+        for position, chunk in enumerate(chunks):
+            embedding = chunk.get("embedding")
+            if embedding:
+                vectors.append(embedding)
+                labels.append(f"{path.name}:{chunk.get('chunk_index', position)}")
+    if not vectors:
+        raise SystemExit(f"No chunk embeddings found in {data_dir}")
+    return normalise_rows(np.asarray(vectors, dtype=np.float32)), labels
+
+
+def load_stem_queries(limit: int) -> Optional[np.ndarray]:
+    """Embed practice question stems, or return ``None`` when sentence-transformers is not installed."""
+    try:
+        from sentence_transformers import SentenceTransformer  # type: ignore
+    except ImportError:
+        return None
+    stems: List[str] = []
+    for path in DEFAULT_QUESTION_FILES:
+        with path.open("r", encoding="utf-8") as f:
+            stems.extend(normalize_text(q["prompt"]) for q in json.load(f) if q.get("prompt"))
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    encoded = model.encode(stems[:limit], batch_size=64, normalize_embeddings=True)
+    return np.asarray(encoded, dtype=np.float32)
+
+
+def split_chunk_queries(corpus: np.ndarray, limit: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hold out ``limit`` chunk vectors as queries so they are not their own nearest neighbour."""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(corpus))
+    held_out = order[: min(limit, len(corpus) // 5)]
+    return corpus[held_out], corpus[np.sort(order[len(held_out) :])]
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int, tile_rows: int = 1024) -> np.ndarray:
+    truth = np.empty((len(queries), k), dtype=np.int64)
+    for start in range(0, len(queries), tile_rows):
+        scores = queries[start : start + tile_rows] @ corpus.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        ranked = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        truth[start : start + tile_rows] = np.take_along_axis(top, ranked, axis=1)
+    return truth
+
+
+def estimate_index_mb(n: int, dim: int, m: int, quantized: bool) -> float:
+    """Vectors (float32, plus int8 copies when quantized) and level-0 HNSW links."""
+    vector_bytes = dim * 4 + (dim if quantized else 0)
+    link_bytes = 2 * m * 4
+    return n * (vector_bytes + link_bytes) / 1e6
+
+
+def build_collection(
+    client: QdrantClient,
+    name: str,
+    corpus: np.ndarray,
+    m: int,
+    ef_construct: int,
+    quantized: bool,
+    full_scan_threshold: int,
+) -> float:
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config=qmodels.VectorParams(size=corpus.shape[1], distance=qmodels.Distance.COSINE),
+        hnsw_config=qmodels.HnswConfigDiff(m=m, ef_construct=ef_construct, full_scan_threshold=full_scan_threshold),
+        optimizers_config=qmodels.OptimizersConfigDiff(indexing_threshold=1),
+        quantization_config=(
+            qmodels.ScalarQuantization(
+                scalar=qmodels.ScalarQuantizationConfig(type=qmodels.ScalarType.INT8, always_ram=True)
+            )
+            if quantized
+            else None
+        ),
+    )
+    start = time.perf_counter()
+    client.upload_collection(
+        collection_name=name,
+        vectors=corpus,
+        ids=list(range(len(corpus))),
+        batch_size=256,
+        wait=True,
+    )
+    # Server mode builds the HNSW graph asynchronously; wait until it is ready.
+    while client.get_collection(name).status != qmodels.CollectionStatus.GREEN:
+        time.sleep(0.2)
+    return time.perf_counter() - start
+
+
+def run_queries(
+    client: QdrantClient,
+    name: str,
+    queries: np.ndarray,
+    k: int,
+    ef: int,
+    quantized: bool,
+    batch_size: int,
+    repeat: int,
+) -> Tuple[List[List[int]], List[float], float]:
+    params = qmodels.SearchParams(
+        hnsw_ef=ef,
+        quantization=qmodels.QuantizationSearchParams(rescore=True) if quantized else None,
+    )
+    latencies: List[float] = []
+    results: List[List[int]] = []
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        results = []
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start : start + batch_size]
+            requests = [qmodels.QueryRequest(query=q.tolist(), limit=k, params=params) for q in batch]
+            t0 = time.perf_counter()
+            responses = client.query_batch_points(collection_name=name, requests=requests)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            results.extend([int(p.id) for p in response.points] for response in responses)
+    return results, latencies, time.perf_counter() - wall_start
+
+
+def recall_at_k(results: List[List[int]], truth: np.ndarray, k: int) -> float:
+    hits = sum(len(set(found[:k]) & set(expected.tolist())) for found, expected in zip(results, truth))
+    return hits / (len(truth) * k)
+
+
+def format_table(rows: List[Dict[str, object]]) -> str:
+    columns = [
+        ("m", "m"),
+        ("ef_construct", "ef_c"),
+        ("quantized", "quant"),
+        ("ef", "ef"),
+        ("batch_size", "batch"),
+        ("recall", "recall@k"),
+        ("p50_ms", "p50 ms"),
+        ("p95_ms", "p95 ms"),
+        ("p99_ms", "p99 ms"),
+        ("qps", "QPS"),
+        ("est_index_mb", "index MB"),
+    ]
+    table = [[title for _, title in columns]]
+    for row in rows:
+        table.append([str(row[key]) for key, _ in columns])
+    widths = [max(len(line[i]) for line in table) for i in range(len(columns))]
+    lines = ["  ".join(cell.rjust(width) for cell, width in zip(line, widths)) for line in table]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.data_dir.exists():
+        raise SystemExit(f"Data directory not found: {args.data_dir}")
+
+    corpus, _ = load_corpus(args.data_dir)
+    query_source = args.queries
+    queries = load_stem_queries(args.num_queries) if query_source == "stems" else None
+    if queries is None:
+        if query_source == "stems":
+            print("sentence-transformers is not installed; using held-out chunk vectors as queries.")
+            query_source = "chunks"
+        queries, corpus = split_chunk_queries(corpus, args.num_queries, args.seed)
+    k = min(args.k, len(corpus))
+    truth = exact_top_k(corpus, queries, k)
+    print(f"Corpus: {len(corpus)} vectors x {corpus.shape[1]}d; {len(queries)} queries; exact top-{k} computed.")
+
+    if args.qdrant_url:
+        client = QdrantClient(url=args.qdrant_url)
+    else:
+        print("Using Qdrant local mode: search is exhaustive, so HNSW settings will not affect recall.")
+        client = QdrantClient(location=":memory:")
+
+    quant_modes = {"off": [False], "on": [True], "both": [False, True]}[args.quantization]
+    rows: List[Dict[str, object]] = []
+    for m, ef_construct, quantized in itertools.product(args.m, args.ef_construct, quant_modes):
+        name = f"bench_m{m}_efc{ef_construct}_{'q8' if quantized else 'f32'}"
+        build_seconds = build_collection(
+            client, name, corpus, m, ef_construct, quantized, args.full_scan_threshold
+        )
+        for ef, batch_size in itertools.product(args.ef, args.batch_sizes):
+            results, latencies, wall = run_queries(
+                client, name, queries, k, ef, quantized, batch_size, args.repeat
+            )
+            rows.append(
+                {
+                    "m": m,
+                    "ef_construct": ef_construct,
+                    "quantized": quantized,
+                    "ef": ef,
+                    "batch_size": batch_size,
+                    "recall": round(recall_at_k(results, truth, k), 4),
+                    "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                    "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+                    "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+                    "qps": round(len(queries) * args.repeat / wall, 1),
+                    "build_s": round(build_seconds, 2),
+                    "est_index_mb": round(estimate_index_mb(len(corpus), corpus.shape[1], m, quantized), 2),
+                }
+            )
+        client.delete_collection(name)
+
+    print(format_table(rows))
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "corpus_size": len(corpus),
+            "dimension": int(corpus.shape[1]),
+            "queries": len(queries),
+            "query_source": query_source,
+            "k": k,
+            "backend": args.qdrant_url or "local",
+            "results": rows,
+        }
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote benchmark results to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Detect duplicate and near-duplicate question stems across practice sets.
+
+Stems are read from published ``questions.json`` files and from raw OCR
+transcripts (one ``.txt`` per screenshot). Each stem is shingled into word
+n-grams that are hashed into a fixed-width vector, so the full corpus fits in
+one dense NumPy matrix. Cosine similarity is computed block by block (row
+tiling keeps memory at ``tile_rows x n`` floats), or, with ``--lsh``, only
+within buckets of stems that share a MinHash band of their shingle sets.
+
+Pairs above ``--near-threshold`` are grouped into clusters with union-find;
+clusters whose weakest link clears ``--dup-threshold`` are reported as
+duplicates, the rest as near-duplicates.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+import numpy as np
+
+from text_normalization import collapse, stem_from_ocr
+
+DEFAULT_QUESTION_FILES = (
+    Path("src/data/practice-tests/otr-baseline/questions.json"),
+    Path("src/data/practice-tests/otr-set-4/questions.json"),
+)
+DEFAULT_OCR_DIRS = (Path("public/raw-questions/ocr"),)
+LSH_MIN_SIZE = 5000
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+# Mersenne prime for MinHash; a * x stays below 2**63 for x < 2**32.
+MINHASH_PRIME = (1 << 31) - 1
+
+
+@dataclass
+class Stem:
+    set_id: str
+    ref: str
+    text: str
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--questions",
+        type=Path,
+        action="append",
+        default=None,
+        help="questions.json file to scan; repeatable (default: otr-baseline and otr-set-4)",
+    )
+    parser.add_argument(
+        "--ocr-dir",
+        type=Path,
+        action="append",
+        default=None,
+        help="Directory of OCR .txt transcripts to scan; repeatable (default: public/raw-questions/ocr)",
+    )
+    parser.add_argument(
+        "--shingle-size",
+        type=int,
+        default=3,
+        help="Word n-gram size used for shingling (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dim",
+        type=int,
+        default=2048,
+        help="Width of the hashed shingle vectors (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1024,
+        help="Stems vectorised per batch (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--tile-rows",
+        type=int,
+        default=2048,
+        help="Rows per similarity tile; bounds memory to tile_rows x n floats (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--near-threshold",
+        type=float,
+        default=0.8,
+        help="Minimum cosine similarity to report a pair (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--dup-threshold",
+        type=float,
+        default=0.95,
+        help="Cosine similarity at which a pair counts as a duplicate (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lsh",
+        choices=("auto", "on", "off"),
+        default="auto",
+        help="Use a MinHash LSH prefilter before exact scoring (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lsh-min-size",
+        type=int,
+        default=LSH_MIN_SIZE,
+        help="Corpus size at which --lsh=auto enables the prefilter (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lsh-bands",
+        type=int,
+        default=32,
+        help="Number of LSH bands (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--lsh-rows",
+        type=int,
+        default=4,
+        help="MinHash values per LSH band (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--include-same-set",
+        action="store_true",
+        help="Also report pairs where both stems come from the same set.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Optional path for the JSON cluster report.",
+    )
+    return parser.parse_args()
+
+
+def load_question_file(path: Path) -> Iterator[Stem]:
+    with path.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("questions", [])
+    set_id = path.parent.name
+    for item in data:
+        text = item.get("prompt") or item.get("headline") or ""
+        if text:
+            yield Stem(set_id=set_id, ref=f"q{item.get('order')}", text=collapse(text))
+
+
+def load_ocr_dir(path: Path) -> Iterator[Stem]:
+    set_id = path.parent.name if path.name == "ocr" else path.name
+    for txt in sorted(path.glob("*.txt")):
+        text = stem_from_ocr(txt.read_text(encoding="utf-8", errors="replace"))
+        if text:
+            yield Stem(set_id=set_id, ref=txt.stem, text=text)
+
+
+def shingles(text: str, size: int) -> List[str]:
+    tokens = TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) < size:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i : i + size]) for i in range(len(tokens) - size + 1)]
+
+
+def shingle_hashes(text: str, size: int, dim: int) -> List[int]:
+    return [zlib.crc32(g.encode("utf-8")) % dim for g in shingles(text, size)]
+
+
+def vectorise(stems: List[Stem], size: int, dim: int, batch_size: int) -> np.ndarray:
+    """Hash shingles into an L2-normalised float32 matrix, one batch at a time."""
+    matrix = np.zeros((len(stems), dim), dtype=np.float32)
+    for start in range(0, len(stems), batch_size):
+        rows: List[int] = []
+        cols: List[int] = []
+        for offset, stem in enumerate(stems[start : start + batch_size]):
+            hashes = shingle_hashes(stem.text, size, dim)
+            rows.extend([start + offset] * len(hashes))
+            cols.extend(hashes)
+        np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1.0)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def blocked_pairs(matrix: np.ndarray, threshold: float, tile_rows: int) -> Iterator[tuple[int, int, float]]:
+    """Yield all ``i < j`` pairs with cosine >= threshold using row tiles."""
+    n = matrix.shape[0]
+    for start in range(0, n, tile_rows):
+        stop = min(start + tile_rows, n)
+        # Only compare against columns >= start so each pair is scored once.
+        sims = matrix[start:stop] @ matrix[start:].T
+        local_i, local_j = np.nonzero(sims >= threshold)
+        keep = local_j > local_i
+        for li, lj in zip(local_i[keep], local_j[keep]):
+            yield start + int(li), start + int(lj), float(sims[li, lj])
+
+
+def minhash_signatures(stems: List[Stem], size: int, num_hashes: int, seed: int = 13) -> np.ndarray:
+    """MinHash signature (``num_hashes`` values) of each stem's shingle set."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MINHASH_PRIME, num_hashes, dtype=np.uint64)[:, None]
+    b = rng.integers(0, MINHASH_PRIME, num_hashes, dtype=np.uint64)[:, None]
+    signatures = np.full((len(stems), num_hashes), MINHASH_PRIME, dtype=np.uint64)
+    for row, stem in enumerate(stems):
+        hashes = {zlib.crc32(g.encode("utf-8")) % MINHASH_PRIME for g in shingles(stem.text, size)}
+        if hashes:
+            values = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))[None, :]
+            signatures[row] = ((a * values + b) % MINHASH_PRIME).min(axis=1)
+    return signatures
+
+
+def lsh_buckets(signatures: np.ndarray, bands: int, rows: int) -> Iterator[np.ndarray]:
+    """Yield the row indices of every band bucket holding two or more stems."""
+    for band in range(bands):
+        _, keys = np.unique(signatures[:, band * rows : (band + 1) * rows], axis=0, return_inverse=True)
+        keys = keys.ravel()
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        stops = np.r_[starts[1:], len(order)]
+        for lo, hi in zip(starts, stops):
+            if hi - lo > 1:
+                yield order[lo:hi]
+
+
+def lsh_pairs(
+    matrix: np.ndarray, signatures: np.ndarray, threshold: float, bands: int, rows: int
+) -> Iterator[tuple[int, int, float]]:
+    """Yield ``i < j`` pairs with cosine >= threshold, scoring each bucket with one matrix product."""
+    seen: set[tuple[int, int]] = set()
+    for bucket in lsh_buckets(signatures, bands, rows):
+        bucket = np.sort(bucket)
+        block = matrix[bucket]
+        sims = block @ block.T
+        local_i, local_j = np.nonzero(np.triu(sims >= threshold, k=1))
+        for li, lj in zip(local_i, local_j):
+            pair = (int(bucket[li]), int(bucket[lj]))
+            if pair not in seen:
+                seen.add(pair)
+                yield pair[0], pair[1], float(sims[li, lj])
+
+
+class UnionFind:
+    def __init__(self, size: int) -> None:
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def build_clusters(
+    stems: List[Stem], pairs: Iterable[tuple[int, int, float]], dup_threshold: float
+) -> List[dict]:
+    pair_list = list(pairs)
+    uf = UnionFind(len(stems))
+    for i, j, _ in pair_list:
+        uf.union(i, j)
+
+    grouped: dict[int, List[tuple[int, int, float]]] = {}
+    for pair in pair_list:
+        grouped.setdefault(uf.find(pair[0]), []).append(pair)
+
+    clusters = []
+    for edges in grouped.values():
+        members = sorted({i for i, _, _ in edges} | {j for _, j, _ in edges})
+        scores = [score for _, _, score in edges]
+        clusters.append(
+            {
+                "kind": "duplicate" if min(scores) >= dup_threshold else "near-duplicate",
+                "max_score": round(max(scores), 4),
+                "min_score": round(min(scores), 4),
+                "members": [
+                    {"set": stems[m].set_id, "ref": stems[m].ref, "stem": stems[m].text[:160]}
+                    for m in members
+                ],
+                "pairs": [
+                    {
+                        "a": f"{stems[i].set_id}/{stems[i].ref}",
+                        "b": f"{stems[j].set_id}/{stems[j].ref}",
+                        "score": round(score, 4),
+                    }
+                    for i, j, score in sorted(edges, key=lambda e: -e[2])
+                ],
+            }
+        )
+    clusters.sort(key=lambda c: (-c["max_score"], c["members"][0]["set"], c["members"][0]["ref"]))
+    return clusters
+
+
+def main() -> None:
+    args = parse_args()
+    question_files = args.questions or list(DEFAULT_QUESTION_FILES)
+    ocr_dirs = args.ocr_dir or list(DEFAULT_OCR_DIRS)
+
+    stems: List[Stem] = []
+    for path in question_files:
+        if not path.exists():
+            raise SystemExit(f"Question file not found: {path}")
+        stems.extend(load_question_file(path))
+    for path in ocr_dirs:
+        if not path.exists():
+            raise SystemExit(f"OCR directory not found: {path}")
+        stems.extend(load_ocr_dir(path))
+    if len(stems) < 2:
+        raise SystemExit("Need at least two question stems to compare.")
+
+    start = time.perf_counter()
+    matrix = vectorise(stems, args.shingle_size, args.dim, args.batch_size)
+    vectorised_at = time.perf_counter()
+
+    use_lsh = args.lsh == "on" or (args.lsh == "auto" and len(stems) >= args.lsh_min_size)
+    if use_lsh:
+        signatures = minhash_signatures(stems, args.shingle_size, args.lsh_bands * args.lsh_rows)
+        pairs: Iterable[tuple[int, int, float]] = lsh_pairs(
+            matrix, signatures, args.near_threshold, args.lsh_bands, args.lsh_rows
+        )
+    else:
+        pairs = blocked_pairs(matrix, args.near_threshold, args.tile_rows)
+
+    if not args.include_same_set:
+        pairs = (p for p in pairs if stems[p[0]].set_id != stems[p[1]].set_id)
+
+    clusters = build_clusters(stems, pairs, args.dup_threshold)
+    finished_at = time.perf_counter()
+
+    duplicates = sum(1 for c in clusters if c["kind"] == "duplicate")
+    print(
+        f"Compared {len(stems)} stems from {len({s.set_id for s in stems})} sets "
+        f"({'LSH prefilter' if use_lsh else 'blocked all-pairs'}) in {finished_at - start:.2f}s "
+        f"(vectorise {vectorised_at - start:.2f}s)."
+    )
+    print(f"Found {duplicates} duplicate and {len(clusters) - duplicates} near-duplicate clusters.")
+    for cluster in clusters[:20]:
+        refs = ", ".join(f"{m['set']}/{m['ref']}" for m in cluster["members"])
+        print(f"  [{cluster['kind']}] {cluster['max_score']:.3f}  {refs}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "stems": len(stems),
+            "method": "lsh" if use_lsh else "blocked",
+            "near_threshold": args.near_threshold,
+            "dup_threshold": args.dup_threshold,
+            "clusters": clusters,
+        }
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote cluster report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,13 @@ Ingest NBCOT source chunks into a Qdrant collection.
 The script expects JSON files produced by the NBCOT preprocessing pipeline.
 Each file should contain a top-level ``metadata`` block and a ``chunks`` array
 with ``text`` and an optional pre-computed ``embedding``.
+
+Heavy dependencies (qdrant-client, tqdm, NumPy, sentence-transformers) are
+imported only by the code paths that use them, so ``--help`` and
+``--validate`` start instantly. ``--validate`` checks every chunk file in
+parallel against both chunk schemas without contacting Qdrant::
+
+    python scripts/ingest_nbcot_qdrant.py --validate
 """
 
 from __future__ import annotations
@@ -12,19 +19,23 @@ from __future__ import annotations
 import argparse
 import itertools
 import json
+import math
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import uuid
-from typing import Iterable, List, Optional
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
 
-from qdrant_client import QdrantClient
-from qdrant_client.http import models as qmodels
-from tqdm import tqdm
+from sparse_index import DEFAULT_INDEX_PATH, SPARSE_VECTOR_NAME, SparseIndex, update_from_files
+from text_normalization import normalize_text
 
-try:  # Optional dependency used only when we must generate embeddings
+if TYPE_CHECKING:  # pragma: no cover
+    from qdrant_client import QdrantClient
     from sentence_transformers import SentenceTransformer  # type: ignore
-except ImportError:  # pragma: no cover - handled at runtime
-    SentenceTransformer = None  # type: ignore
+
+DEFAULT_VECTOR_SIZE = 384  # all-MiniLM-L6-v2
+MAX_REPORTED_ISSUES = 10
 
 
 def parse_args() -> argparse.Namespace:
@@ -62,6 +73,48 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Optional maximum number of chunks to ingest (for testing).",
     )
+    parser.add_argument(
+        "--projection",
+        type=Path,
+        default=None,
+        help="Projection file from scripts/vector_compression.py fit; vectors are projected before upload.",
+    )
+    parser.add_argument(
+        "--vector-datatype",
+        choices=("float32", "float16", "uint8"),
+        default="float32",
+        help="Storage datatype for vectors in Qdrant (default: %(default)s). uint8 requires --projection.",
+    )
+    parser.add_argument(
+        "--on-disk",
+        action="store_true",
+        help="Store original vectors on disk (memmap) instead of in RAM.",
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help=(
+            f"Also store BM25 sparse vectors (named '{SPARSE_VECTOR_NAME}'); the local keyword index is first "
+            "updated to match the chunk files in --data-dir."
+        ),
+    )
+    parser.add_argument(
+        "--sparse-index",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="Local sparse index file used with --sparse (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--validate",
+        action="store_true",
+        help="Check the chunk files (schema, vector dimensions, ids, metadata) and exit without contacting Qdrant.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Parallel processes for --validate (default: %(default)s)",
+    )
     return parser.parse_args()
 
 
@@ -79,7 +132,19 @@ def load_chunks(path: Path) -> tuple[dict, list[dict]]:
     return metadata, chunks
 
 
-def ensure_collection(client: QdrantClient, name: str, vector_size: int, recreate: bool = False) -> None:
+def ensure_collection(
+    client: QdrantClient,
+    name: str,
+    vector_size: int,
+    recreate: bool = False,
+    *,
+    distance: str = "Cosine",
+    datatype: str = "float32",
+    on_disk: bool = False,
+    sparse: bool = False,
+) -> None:
+    from qdrant_client.http import models as qmodels
+
     existing = {c.name for c in client.get_collections().collections}
     if recreate and name in existing:
         print(f"Dropping existing collection '{name}'")
@@ -87,15 +152,22 @@ def ensure_collection(client: QdrantClient, name: str, vector_size: int, recreat
         existing.remove(name)
 
     if name not in existing:
-        print(f"Creating collection '{name}' (vector size={vector_size})")
+        print(f"Creating collection '{name}' (vector size={vector_size}, {datatype}, {distance})")
         client.create_collection(
             collection_name=name,
-            vectors_config=qmodels.VectorParams(size=vector_size, distance=qmodels.Distance.COSINE),
+            vectors_config=qmodels.VectorParams(
+                size=vector_size,
+                distance=qmodels.Distance(distance),
+                datatype=qmodels.Datatype(datatype),
+                on_disk=on_disk or None,
+            ),
+            sparse_vectors_config=(
+                {SPARSE_VECTOR_NAME: qmodels.SparseVectorParams(modifier=qmodels.Modifier.IDF)} if sparse else None
+            ),
         )
     else:
         # Optionally verify vector size matches
         info = client.get_collection(name)
-        current_size = info.vectors_count
         # Not a perfect guard, but warn if mismatch might occur
         params = info.config.params
         if params and hasattr(params, "vectors"):
@@ -105,11 +177,40 @@ def ensure_collection(client: QdrantClient, name: str, vector_size: int, recreat
                     f"Collection '{name}' exists but vector size ({vectors_config.size}) "
                     f"does not match incoming vectors ({vector_size})."
                 )
+            if isinstance(vectors_config, qmodels.VectorParams):
+                mismatches = []
+                if vectors_config.distance != qmodels.Distance(distance):
+                    mismatches.append(f"{vectors_config.distance.value} distance (needs {distance})")
+                current_datatype = vectors_config.datatype or qmodels.Datatype.FLOAT32
+                if current_datatype != qmodels.Datatype(datatype):
+                    mismatches.append(f"{current_datatype.value} vectors (--vector-datatype is {datatype})")
+                if mismatches:
+                    raise RuntimeError(
+                        f"Collection '{name}' exists with {' and '.join(mismatches)}; re-run with --recreate."
+                    )
+            if sparse and SPARSE_VECTOR_NAME not in (params.sparse_vectors or {}):
+                raise RuntimeError(
+                    f"Collection '{name}' has no '{SPARSE_VECTOR_NAME}' sparse vector; "
+                    "re-run with --recreate to add it."
+                )
+
+
+def chunk_point_id(source_file: Path, chunk: dict, fallback_index: int) -> str:
+    raw_id = chunk.get("id")
+    try:
+        point_id = uuid.UUID(str(raw_id)) if raw_id else None
+    except (ValueError, TypeError):
+        point_id = None
+
+    if point_id is None:
+        uid_source = f"{source_file.name}:{chunk.get('chunk_index', fallback_index)}"
+        point_id = uuid.uuid5(uuid.NAMESPACE_URL, uid_source)
+    return str(point_id)
 
 
 def build_payload(base_meta: dict, chunk: dict, source_file: Path) -> dict:
     payload = {
-        "text": chunk.get("text", ""),
+        "text": normalize_text(chunk.get("text", "")),
         "chunk_index": chunk.get("chunk_index"),
         "chunk_id": chunk.get("id"),
         "source_file": source_file.name,
@@ -127,14 +228,197 @@ def build_payload(base_meta: dict, chunk: dict, source_file: Path) -> dict:
 
 
 def maybe_build_embedder() -> Optional[SentenceTransformer]:
-    if SentenceTransformer is None:
+    try:  # Optional dependency used only when we must generate embeddings
+        from sentence_transformers import SentenceTransformer  # type: ignore
+    except ImportError as exc:  # pragma: no cover - handled at runtime
         raise RuntimeError(
             "sentence-transformers is not installed but embeddings are missing in the source data."
-        )
+        ) from exc
     print("Loading sentence-transformer model 'all-MiniLM-L6-v2' to backfill missing embeddings...")
     return SentenceTransformer("all-MiniLM-L6-v2")
 
 
+def chunk_schema(chunk: dict) -> Optional[str]:
+    """``embedded`` for ``chunk_index``/``embedding`` chunks, ``metadata`` for ``id``/``metadata`` chunks."""
+    if "chunk_index" in chunk:
+        return "embedded"
+    if "metadata" in chunk:
+        return "metadata"
+    return None
+
+
+def validate_chunk_file(path: Path) -> dict:
+    """Check one chunk file on its own; cross-file checks happen in ``validate_chunk_files``."""
+    report: dict = {
+        "file": path.name,
+        "schema": None,
+        "chunks": 0,
+        "dims": [],
+        "missing_embeddings": 0,
+        "point_keys": [],
+        "errors": [],
+        "warnings": [],
+    }
+    errors: List[str] = report["errors"]
+    warnings: List[str] = report["warnings"]
+    try:
+        base_meta, chunks = load_chunks(path)
+    except (OSError, ValueError) as exc:
+        errors.append(f"cannot load: {exc}")
+        return report
+    if not isinstance(base_meta, dict):
+        errors.append("top-level metadata is not an object")
+        base_meta = {}
+    report["chunks"] = len(chunks)
+
+    schemas = {chunk_schema(chunk) if isinstance(chunk, dict) else None for chunk in chunks}
+    if None in schemas:
+        errors.append("chunks without chunk_index or metadata (unknown schema)")
+    schemas.discard(None)
+    if len(schemas) > 1:
+        errors.append(f"mixed chunk schemas: {', '.join(sorted(schemas))}")
+    schema = report["schema"] = schemas.pop() if len(schemas) == 1 else None
+
+    expected = base_meta.get("chunk_count", base_meta.get("total_chunks"))
+    if expected is not None and expected != len(chunks):
+        errors.append(f"metadata lists {expected} chunks but the file has {len(chunks)}")
+    source = Path(str(base_meta.get("source", ""))).stem
+
+    ids: Dict[str, int] = {}
+    indices: Dict[int, int] = {}
+    dims = set()
+    last_page = -1
+    for position, chunk in enumerate(chunks):
+        kind = chunk_schema(chunk) if isinstance(chunk, dict) else None
+        if kind is None:
+            continue
+        where = f"chunk {position}"
+        text = chunk.get("text")
+        if not isinstance(text, str):
+            errors.append(f"{where}: text is missing or not a string")
+        elif not text.strip():
+            warnings.append(f"{where}: empty text (skipped at ingest)")
+
+        raw_id = chunk.get("id")
+        if raw_id is not None:
+            if raw_id in ids:
+                errors.append(f"{where}: id {raw_id!r} duplicates chunk {ids[raw_id]}")
+            ids.setdefault(raw_id, position)
+        elif kind == "metadata":
+            errors.append(f"{where}: missing id")
+
+        # Either schema may carry embeddings; chunks without one are embedded at ingest.
+        embedding = chunk.get("embedding")
+        if embedding is None:
+            if isinstance(text, str) and text:
+                report["missing_embeddings"] += 1
+        elif not isinstance(embedding, list) or not all(
+            isinstance(v, (int, float)) and math.isfinite(v) for v in embedding
+        ):
+            errors.append(f"{where}: embedding is not a list of finite numbers")
+        else:
+            dims.add(len(embedding))
+
+        if kind == "embedded":
+            index = chunk.get("chunk_index")
+        else:
+            meta = chunk.get("metadata")
+            if not isinstance(meta, dict):
+                errors.append(f"{where}: metadata is not an object")
+                continue
+            index = meta.get("chunk_index")
+            page = meta.get("page_number")
+            if source and meta.get("source") != source:
+                errors.append(f"{where}: metadata source {meta.get('source')!r} does not match {source!r}")
+            if not isinstance(page, int) or page < 0:
+                errors.append(f"{where}: page_number {page!r} is not a non-negative integer")
+            elif page < last_page:
+                warnings.append(f"{where}: page_number {page} goes back from {last_page}")
+            else:
+                last_page = page
+
+        if not isinstance(index, int):
+            errors.append(f"{where}: chunk_index {index!r} is not an integer")
+        elif index in indices:
+            errors.append(f"{where}: chunk_index {index} duplicates chunk {indices[index]}")
+        else:
+            indices[index] = position
+
+        if isinstance(text, str) and text:
+            # Inputs to chunk_point_id; the fallback counter spans files, so ids are resolved later.
+            report["point_keys"].append((raw_id, chunk.get("chunk_index")))
+
+    if indices and sorted(indices) != list(range(len(indices))):
+        warnings.append("chunk_index values are not contiguous from 0")
+    if len(dims) > 1:
+        errors.append(f"embeddings have mixed dimensions: {sorted(dims)}")
+    report["dims"] = sorted(dims)
+    return report
+
+
+def validate_chunk_files(files: List[Path], workers: int) -> List[dict]:
+    """Validate files in parallel, then check point ids and vector size across the whole corpus."""
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            reports = list(pool.map(validate_chunk_file, files))
+    else:
+        reports = [validate_chunk_file(path) for path in files]
+
+    # Mirror ingest: point ids come from chunk_point_id with a running counter over non-empty chunks.
+    seen: Dict[str, str] = {}
+    processed = 0
+    for path, report in zip(files, reports):
+        collisions: List[str] = []
+        for raw_id, chunk_index in report.pop("point_keys"):
+            key = {"id": raw_id} if chunk_index is None else {"id": raw_id, "chunk_index": chunk_index}
+            point_id = chunk_point_id(path, key, processed)
+            processed += 1
+            if point_id in seen:
+                collisions.append(seen[point_id])
+            else:
+                seen[point_id] = path.name
+        if collisions:
+            report["errors"].append(
+                f"{len(collisions)} Qdrant point id(s) collide with chunks in {', '.join(sorted(set(collisions)))}"
+            )
+
+    # Files with mixed dimensions already report it; compare the consistent ones across the corpus.
+    dims = {report["dims"][0] for report in reports if len(report["dims"]) == 1}
+    if len(dims) > 1:
+        for report in reports:
+            if len(report["dims"]) == 1:
+                report["errors"].append(f"vector size {report['dims'][0]} differs from other files {sorted(dims)}")
+    return reports
+
+
+def run_validation(files: List[Path], workers: int) -> None:
+    start = time.perf_counter()
+    reports = validate_chunk_files(files, workers)
+    failed = 0
+    for report in reports:
+        status = "FAIL" if report["errors"] else "ok"
+        failed += bool(report["errors"])
+        dims = "/".join(str(dim) for dim in report["dims"]) or "-"
+        detail = f"{report['chunks']} chunks, schema={report['schema'] or '?'}, dim={dims}"
+        if report["missing_embeddings"]:
+            detail += f", {report['missing_embeddings']} to embed"
+        print(f"{status:<4}  {report['file']}: {detail}")
+        for level, issues in (("error", report["errors"]), ("warning", report["warnings"])):
+            for issue in issues[:MAX_REPORTED_ISSUES]:
+                print(f"      {level}: {issue}")
+            if len(issues) > MAX_REPORTED_ISSUES:
+                print(f"      ... {len(issues) - MAX_REPORTED_ISSUES} more {level}s")
+    to_embed = [report for report in reports if report["missing_embeddings"]]
+    if to_embed:
+        print(
+            f"{sum(r['missing_embeddings'] for r in to_embed)} chunks in {len(to_embed)} file(s) have no embedding; "
+            "ingest will load sentence-transformers for them."
+        )
+    print(f"Validated {len(reports)} files in {time.perf_counter() - start:.2f}s; {failed} failed.")
+    if failed:
+        raise SystemExit(1)
+
+
 def main() -> None:
     args = parse_args()
     data_dir: Path = args.data_dir
@@ -145,6 +429,16 @@ def main() -> None:
     if not files:
         raise SystemExit(f"No *_chunks.json files found in {data_dir}")
 
+    if args.validate:
+        run_validation(files, args.workers)
+        return
+
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+    from tqdm import tqdm
+
+    from vector_compression import VectorProjection, distance_for
+
     client = QdrantClient(url=args.qdrant_url)
 
     # Determine vector size from the first embedding we encounter
@@ -162,9 +456,47 @@ def main() -> None:
             break
 
     if vector_size is None:
-        vector_size = 384  # default for MiniLM; fallback if we must regenerate
+        vector_size = DEFAULT_VECTOR_SIZE  # fallback if we must regenerate
+
+    projection = None
+    if args.projection is not None:
+        projection = VectorProjection.load(args.projection)
+        if projection.input_dim != vector_size:
+            raise SystemExit(
+                f"Projection expects {projection.input_dim}d vectors but the chunks are {vector_size}d."
+            )
+        vector_size = projection.dim
+    elif args.vector_datatype == "uint8":
+        raise SystemExit("--vector-datatype uint8 needs --projection for its value range.")
+
+    ensure_collection(
+        client,
+        args.collection,
+        vector_size,
+        recreate=args.recreate,
+        distance=distance_for(args.vector_datatype, projection),
+        datatype=args.vector_datatype,
+        on_disk=args.on_disk,
+        sparse=args.sparse,
+    )
 
-    ensure_collection(client, args.collection, vector_size, recreate=args.recreate)
+    sparse_index = None
+    if args.sparse:
+        # Index every file before computing any vector, so all chunks share the final average length.
+        sparse_index = SparseIndex.load(args.sparse_index)
+        reindexed, removed = update_from_files(sparse_index, files)
+        if removed:
+            # Points of deleted, shrunk or renumbered chunks would otherwise keep stale bm25 weights.
+            client.delete(
+                collection_name=args.collection,
+                points_selector=qmodels.PointIdsList(points=removed),
+                wait=True,
+            )
+        sparse_index.save(args.sparse_index)
+        print(
+            f"Sparse index: re-indexed {reindexed} chunks, deleted {len(removed)} stale points; "
+            f"{sparse_index.num_docs} chunks, {len(sparse_index.vocab)} terms -> {args.sparse_index}"
+        )
 
     embedder = None
     if vector_size is None:
@@ -191,25 +523,25 @@ def main() -> None:
             if embedding is None:
                 if embedder is None:
                     embedder = maybe_build_embedder()
-                embedding = embedder.encode(text, normalize_embeddings=True).tolist()
+                embedding = embedder.encode(normalize_text(text), normalize_embeddings=True).tolist()
                 vector_size = len(embedding)
 
-            raw_id = chunk.get("id")
-            try:
-                point_id = uuid.UUID(str(raw_id)) if raw_id else None
-            except (ValueError, TypeError):
-                point_id = None
+            point_id = chunk_point_id(file, chunk, processed)
 
-            if point_id is None:
-                uid_source = f"{file.name}:{chunk.get('chunk_index', processed)}"
-                point_id = uuid.uuid5(uuid.NAMESPACE_URL, uid_source)
+            if projection is not None:
+                embedding = projection.prepare([embedding], args.vector_datatype)[0].tolist()
 
             payload = build_payload(base_meta, chunk, file)
 
+            vector = embedding
+            if sparse_index is not None:
+                indices, values = sparse_index.vector(point_id)
+                vector = {"": embedding, SPARSE_VECTOR_NAME: qmodels.SparseVector(indices=indices, values=values)}
+
             batch.append(
                 qmodels.PointStruct(
-                    id=str(point_id),
-                    vector=embedding,
+                    id=point_id,
+                    vector=vector,
                     payload=payload,
                 )
             )
@@ -16,7 +16,9 @@ import subprocess
 import sys
 import time
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Optional
+
+from text_normalization import SpellCorrector, clean_ocr_text, load_corrector
 
 
 def build_logger(log_path: Path) -> logging.Logger:
@@ -37,7 +39,8 @@ def build_logger(log_path: Path) -> logging.Logger:
         file_handler.setFormatter(formatter)
         logger.addHandler(file_handler)
 
-    if not any(isinstance(handler, logging.StreamHandler) for handler in logger.handlers):
+    # FileHandler subclasses StreamHandler, so match the console handler's exact type.
+    if not any(type(handler) is logging.StreamHandler for handler in logger.handlers):
         stream_handler = logging.StreamHandler(sys.stdout)
         stream_handler.setFormatter(formatter)
         logger.addHandler(stream_handler)
@@ -60,6 +63,7 @@ def run_tesseract(
     lang: str,
     psm: int,
     logger: logging.Logger,
+    corrector: Optional[SpellCorrector] = None,
 ) -> bool:
     # Tesseract expects the output path without a file extension.
     output_txt_path.parent.mkdir(parents=True, exist_ok=True)
@@ -91,9 +95,10 @@ def run_tesseract(
         logger.error("Tesseract completed but %s was not created", output_txt_path.name)
         return False
 
-    # Ensure files use UTF-8 (Tesseract already outputs UTF-8, but normalize newlines).
+    # Ensure files use UTF-8 (Tesseract already outputs UTF-8, but normalize newlines,
+    # punctuation and, when requested, garbled words).
     text = output_txt_path.read_text(encoding="utf-8", errors="replace")
-    output_txt_path.write_text(text.replace("\r\n", "\n"), encoding="utf-8")
+    output_txt_path.write_text(clean_ocr_text(text, corrector), encoding="utf-8")
 
     return True
 
@@ -139,6 +144,11 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Re-run OCR even if a destination text file already exists.",
     )
+    parser.add_argument(
+        "--correct-spelling",
+        action="store_true",
+        help="Repair garbled OCR words using the spelling index built from data/nbcot-sources.",
+    )
     return parser.parse_args()
 
 
@@ -165,6 +175,8 @@ def main() -> int:
         logger.warning("No images found in %s", source_dir)
         return 0
 
+    corrector = load_corrector() if args.correct_spelling else None
+
     processed = skipped = failed = 0
 
     for image_path in images:
@@ -184,6 +196,7 @@ def main() -> int:
             lang=args.lang,
             psm=args.psm,
             logger=logger,
+            corrector=corrector,
         )
         duration = time.perf_counter() - start
 
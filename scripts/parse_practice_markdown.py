@@ -2,20 +2,10 @@ import re
 import json
 from pathlib import Path
 
+from text_normalization import normalize_text
+
 def clean_text(value: str) -> str:
-    replacements = {
-        "\u2019": "'",
-        "\u2018": "'",
-        "\u201c": '"',
-        "\u201d": '"',
-        "\u2013": "-",
-        "\u2014": "-",
-        "\u00a0": " ",
-        "\ufffd": "'",
-    }
-    for bad, good in replacements.items():
-        value = value.replace(bad, good)
-    return value
+    return normalize_text(value)
 
 root = Path(r"e:/Projects/NBCOT-Clone")
 md_path = root / "Keely & Sierra NBCOT study log pre-test.md"
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Export and import a Qdrant collection without re-embedding.
+
+``export`` scrolls a collection in large pages and writes a snapshot
+directory containing:
+
+* ``vectors.<name>.f32`` - every dense vector as one contiguous row-major
+  float32 array (``default`` is the unnamed vector);
+* ``payloads.jsonl.gz`` - one ``{"id": ..., "payload": ...}`` line per point,
+  in the same order as the vector rows; named sparse vectors (e.g. the
+  ``bm25`` keyword vectors) are kept on the same line under ``"sparse"``;
+* ``manifest.json`` - point count, vector shapes and the collection config.
+
+``import`` recreates the collection from the manifest with HNSW indexing
+disabled, bulk-uploads the memory-mapped vectors alongside the streamed
+payloads, then restores the indexing threshold so the graph is built once.
+
+Usage::
+
+    python scripts/qdrant_snapshot.py export --collection nbcot_sources --out snapshots/nbcot_sources
+    python scripts/qdrant_snapshot.py import --snapshot snapshots/nbcot_sources --qdrant-url http://localhost:6333
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qmodels
+
+MANIFEST_VERSION = 1
+DEFAULT_VECTOR = "default"
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--qdrant-url",
+        default=os.environ.get("QDRANT_URL", "http://localhost:6333"),
+        help="Qdrant HTTP endpoint (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--qdrant-path",
+        type=Path,
+        default=None,
+        help="Use Qdrant local mode stored at this path instead of --qdrant-url.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Write a collection to a snapshot directory.")
+    export.add_argument("--collection", default="nbcot_sources", help="Collection to export (default: %(default)s)")
+    export.add_argument("--out", type=Path, required=True, help="Snapshot directory to create.")
+    export.add_argument(
+        "--page-size",
+        type=int,
+        default=2048,
+        help="Points per scroll request (default: %(default)s)",
+    )
+
+    restore = subparsers.add_parser("import", help="Create a collection from a snapshot directory.")
+    restore.add_argument("--snapshot", type=Path, required=True, help="Snapshot directory written by 'export'.")
+    restore.add_argument(
+        "--collection",
+        default=None,
+        help="Target collection name (default: the exported collection's name).",
+    )
+    restore.add_argument(
+        "--batch-size",
+        type=int,
+        default=1024,
+        help="Points per upload request (default: %(default)s)",
+    )
+    restore.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Parallel upload workers (default: %(default)s)",
+    )
+    restore.add_argument(
+        "--recreate",
+        action="store_true",
+        help="Drop the target collection first if it exists.",
+    )
+    return parser.parse_args()
+
+
+def build_client(args: argparse.Namespace) -> QdrantClient:
+    if args.qdrant_path is not None:
+        return QdrantClient(path=str(args.qdrant_path))
+    return QdrantClient(url=args.qdrant_url)
+
+
+def dump_model(model) -> Optional[dict]:
+    if model is None:
+        return None
+    if hasattr(model, "model_dump"):
+        return model.model_dump(mode="json", exclude_none=True)
+    return json.loads(model.json(exclude_none=True))  # pydantic v1
+
+
+def dense_vector_params(params: qmodels.CollectionParams) -> Dict[str, dict]:
+    vectors = params.vectors
+    if isinstance(vectors, dict):
+        return {name: dump_model(config) for name, config in vectors.items()}
+    return {DEFAULT_VECTOR: dump_model(vectors)}
+
+
+def point_dense_vector(point, name: str):
+    if not isinstance(point.vector, dict):
+        return point.vector
+    # Collections with sparse vectors return the unnamed dense vector under "".
+    return point.vector["" if name == DEFAULT_VECTOR else name]
+
+
+def point_sparse_vectors(point, names) -> Dict[str, dict]:
+    if not names or not isinstance(point.vector, dict):
+        return {}
+    return {
+        name: {"indices": list(vector.indices), "values": list(vector.values)}
+        for name in names
+        if (vector := point.vector.get(name)) is not None
+    }
+
+
+def vector_file(snapshot: Path, name: str) -> Path:
+    return snapshot / f"vectors.{name}.f32"
+
+
+def export_collection(client: QdrantClient, collection: str, out: Path, page_size: int) -> dict:
+    info = client.get_collection(collection)
+    vector_params = dense_vector_params(info.config.params)
+    sparse_names = sorted(info.config.params.sparse_vectors or {})
+    out.mkdir(parents=True, exist_ok=True)
+
+    handles = {name: vector_file(out, name).open("wb") for name in vector_params}
+    count = 0
+    offset = None
+    try:
+        with gzip.open(out / "payloads.jsonl.gz", "wt", encoding="utf-8", compresslevel=3) as payloads:
+            while True:
+                points, offset = client.scroll(
+                    collection_name=collection,
+                    limit=page_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True,
+                )
+                if not points:
+                    break
+                for name, handle in handles.items():
+                    rows = [point_dense_vector(point, name) for point in points]
+                    np.asarray(rows, dtype=np.float32).tofile(handle)
+                for point in points:
+                    record = {"id": point.id, "payload": point.payload}
+                    sparse = point_sparse_vectors(point, sparse_names)
+                    if sparse:
+                        record["sparse"] = sparse
+                    payloads.write(json.dumps(record, ensure_ascii=False))
+                    payloads.write("\n")
+                count += len(points)
+                print(f"\rExported {count} points", end="", flush=True)
+                if offset is None:
+                    break
+    finally:
+        for handle in handles.values():
+            handle.close()
+    print()
+
+    config = info.config
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "collection": collection,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "points": count,
+        "vectors": {
+            name: {"file": vector_file(out, name).name, "dtype": "float32", "shape": [count, params["size"]]}
+            for name, params in vector_params.items()
+        },
+        "sparse_vectors": sparse_names,
+        "payloads": "payloads.jsonl.gz",
+        "config": {
+            "params": dump_model(config.params),
+            "hnsw_config": dump_model(config.hnsw_config),
+            "optimizer_config": dump_model(config.optimizer_config),
+            "quantization_config": dump_model(config.quantization_config),
+        },
+    }
+    (out / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    return manifest
+
+
+def quantization_from_dict(data: Optional[dict]):
+    if not data:
+        return None
+    if "scalar" in data:
+        return qmodels.ScalarQuantization(**data)
+    if "product" in data:
+        return qmodels.ProductQuantization(**data)
+    if "binary" in data:
+        return qmodels.BinaryQuantization(**data)
+    raise ValueError(f"Unsupported quantization config in manifest: {data}")
+
+
+def iter_payloads(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def iter_point_vectors(matrices: Dict[str, np.ndarray], payload_path: Path, named: bool) -> Iterator[dict]:
+    for row, record in enumerate(iter_payloads(payload_path)):
+        vector = {
+            (key if named else ""): matrix[row].tolist() for key, matrix in matrices.items()
+        }
+        for key, sparse in (record.get("sparse") or {}).items():
+            vector[key] = qmodels.SparseVector(**sparse)
+        yield vector
+
+
+def import_collection(
+    client: QdrantClient,
+    snapshot: Path,
+    collection: Optional[str],
+    batch_size: int,
+    parallel: int,
+    recreate: bool,
+) -> int:
+    manifest = json.loads((snapshot / "manifest.json").read_text(encoding="utf-8"))
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise SystemExit(f"Unsupported snapshot manifest version: {manifest.get('version')}")
+    name = collection or manifest["collection"]
+    config = manifest["config"]
+    params = config["params"]
+
+    if client.collection_exists(name):
+        if not recreate:
+            raise SystemExit(f"Collection '{name}' already exists; pass --recreate to replace it.")
+        client.delete_collection(name)
+
+    vectors_config = params["vectors"]
+    named = DEFAULT_VECTOR not in manifest["vectors"]
+    sparse_names = manifest.get("sparse_vectors") or []
+    optimizer = config.get("optimizer_config") or {}
+    indexing_threshold = optimizer.get("indexing_threshold")
+    if indexing_threshold is None:  # 0 (indexing disabled) must survive the round trip
+        indexing_threshold = DEFAULT_INDEXING_THRESHOLD
+    client.create_collection(
+        collection_name=name,
+        vectors_config=(
+            {key: qmodels.VectorParams(**value) for key, value in vectors_config.items()}
+            if named
+            else qmodels.VectorParams(**vectors_config)
+        ),
+        sparse_vectors_config=(
+            {key: qmodels.SparseVectorParams(**value) for key, value in params["sparse_vectors"].items()}
+            if params.get("sparse_vectors")
+            else None
+        ),
+        on_disk_payload=params.get("on_disk_payload"),
+        hnsw_config=qmodels.HnswConfigDiff(**config["hnsw_config"]) if config.get("hnsw_config") else None,
+        # Defer HNSW construction until every point is uploaded.
+        optimizers_config=qmodels.OptimizersConfigDiff(indexing_threshold=0),
+        quantization_config=quantization_from_dict(config.get("quantization_config")),
+    )
+
+    count = manifest["points"]
+    if count:  # an empty collection exports zero-byte matrices, which cannot be memory-mapped
+        matrices: Dict[str, np.ndarray] = {
+            key: np.memmap(snapshot / spec["file"], dtype=np.float32, mode="r", shape=tuple(spec["shape"]))
+            for key, spec in manifest["vectors"].items()
+        }
+        # Payloads are streamed twice (ids and bodies) rather than held in memory.
+        payload_path = snapshot / manifest["payloads"]
+        vectors = matrices if named else matrices[DEFAULT_VECTOR]
+        if sparse_names:
+            # Sparse vectors live on the payload lines, so points are assembled one at a time.
+            vectors = iter_point_vectors(matrices, payload_path, named)
+        client.upload_collection(
+            collection_name=name,
+            vectors=vectors,
+            payload=(record["payload"] for record in iter_payloads(payload_path)),
+            ids=(record["id"] for record in iter_payloads(payload_path)),
+            batch_size=batch_size,
+            parallel=parallel,
+            wait=True,
+        )
+    uploaded = client.count(collection_name=name, exact=True).count
+    if uploaded != count:
+        raise SystemExit(f"Imported {uploaded} points but the manifest lists {count}.")
+    client.update_collection(
+        collection_name=name,
+        optimizers_config=qmodels.OptimizersConfigDiff(indexing_threshold=indexing_threshold),
+    )
+    return count
+
+
+def main() -> None:
+    args = parse_args()
+    client = build_client(args)
+    start = time.perf_counter()
+
+    if args.command == "export":
+        manifest = export_collection(client, args.collection, args.out, args.page_size)
+        size = sum(p.stat().st_size for p in args.out.iterdir()) / 1e6
+        print(
+            f"Exported {manifest['points']} points from '{args.collection}' to {args.out} "
+            f"({size:.1f} MB) in {time.perf_counter() - start:.2f}s."
+        )
+        return
+
+    if not (args.snapshot / "manifest.json").exists():
+        raise SystemExit(f"No manifest.json found in {args.snapshot}")
+    count = import_collection(
+        client, args.snapshot, args.collection, args.batch_size, args.parallel, args.recreate
+    )
+    print(f"Imported {count} points in {time.perf_counter() - start:.2f}s; indexing continues in the background.")
+
+
+if __name__ == "__main__":
+    main()
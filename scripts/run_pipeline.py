@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline from practice-test screenshots to searchable vectors.
+
+Runs OCR, question parsing, embedding and Qdrant upserts as concurrent
+stages connected by bounded queues, so a screenshot can be uploaded while
+later ones are still being OCR'd. A full queue blocks the stage feeding it
+(backpressure), keeping memory flat however many screenshots are queued.
+
+Each stage has its own worker count and batch size; per-stage throughput is
+reported while the run is in progress and summarised at the end. Uploaded
+screenshots are recorded in a checkpoint file, so an interrupted run resumes
+where it stopped (OCR text already on disk is also reused).
+
+Usage::
+
+    python scripts/run_pipeline.py --source public/raw-questions-01 --set-id otr4 --ocr-workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+
+from ocr_practice_test import build_logger, collect_images, run_tesseract
+from text_normalization import clean_ocr_text, load_corrector, parse_ocr_question
+
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+STOP = object()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--source",
+        type=Path,
+        default=Path("public/raw-questions-01"),
+        help="Directory containing practice test screenshots (default: %(default)s)",
+    )
+    parser.add_argument("--set-id", required=True, help="Practice set identifier stored on every point, e.g. otr4.")
+    parser.add_argument(
+        "--ocr-dir",
+        type=Path,
+        default=None,
+        help="Where OCR text is written and reused. Defaults to <source>/ocr.",
+    )
+    parser.add_argument(
+        "--collection",
+        default="practice_questions",
+        help="Qdrant collection for question vectors (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--qdrant-url",
+        default=os.environ.get("QDRANT_URL", "http://localhost:6333"),
+        help="Qdrant HTTP endpoint (default: %(default)s)",
+    )
+    parser.add_argument("--tesseract", default="tesseract", help="Tesseract executable to invoke.")
+    parser.add_argument("--lang", default="eng", help="Language(s) to pass to Tesseract.")
+    parser.add_argument("--psm", default=6, type=int, help="Page segmentation mode to pass to Tesseract.")
+    parser.add_argument("--ocr-workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--parse-workers", type=int, default=1)
+    parser.add_argument("--embed-workers", type=int, default=1)
+    parser.add_argument("--upload-workers", type=int, default=2)
+    parser.add_argument("--embed-batch", type=int, default=32, help="Texts per embedding call (default: %(default)s)")
+    parser.add_argument("--upload-batch", type=int, default=64, help="Points per upsert (default: %(default)s)")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Capacity of each inter-stage queue (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Checkpoint file of uploaded screenshots. Defaults to <ocr-dir>/pipeline-checkpoint.json.",
+    )
+    parser.add_argument(
+        "--correct-spelling",
+        action="store_true",
+        help="Repair garbled OCR words before parsing.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the checkpoint and existing OCR text.",
+    )
+    parser.add_argument(
+        "--report-every",
+        type=float,
+        default=5.0,
+        help="Seconds between progress reports (default: %(default)s)",
+    )
+    return parser.parse_args()
+
+
+@dataclass
+class Item:
+    image: Path
+    text: str = ""
+    prompt: str = ""
+    options: List[str] = field(default_factory=list)
+    vector: Optional[List[float]] = None
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    failed: int = 0
+    busy: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, count: int, seconds: float, failed: int = 0) -> None:
+        with self.lock:
+            self.processed += count
+            self.failed += failed
+            self.busy += seconds
+
+
+class Stage:
+    """A pool of worker threads moving batches from ``inbox`` to ``outbox``."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[List[Item]], List[Item]],
+        workers: int,
+        batch_size: int,
+        inbox: "queue.Queue",
+        outbox: Optional["queue.Queue"],
+        logger: logging.Logger,
+    ) -> None:
+        self.name = name
+        self.handler = handler
+        self.batch_size = batch_size
+        self.inbox = inbox
+        self.outbox = outbox
+        self.logger = logger
+        self.stats = StageStats()
+        self.threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))
+        ]
+        self._remaining = len(self.threads)
+        self._remaining_lock = threading.Lock()
+
+    def start(self) -> None:
+        for thread in self.threads:
+            thread.start()
+
+    def join(self) -> None:
+        for thread in self.threads:
+            thread.join()
+
+    def _take_batch(self) -> tuple[List[Item], bool]:
+        """Block for one item, then drain up to ``batch_size`` without waiting."""
+        first = self.inbox.get()
+        if first is STOP:
+            return [], True
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get_nowait()
+            except queue.Empty:
+                break
+            if item is STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._take_batch()
+            if batch:
+                start = time.perf_counter()
+                try:
+                    results = self.handler(batch)
+                except Exception:  # keep the pipeline alive; the batch is retried on resume
+                    self.logger.exception("%s failed on %d item(s)", self.name, len(batch))
+                    self.stats.record(0, time.perf_counter() - start, failed=len(batch))
+                    results = []
+                else:
+                    self.stats.record(len(results), time.perf_counter() - start, failed=len(batch) - len(results))
+                if self.outbox is not None:
+                    for item in results:
+                        self.outbox.put(item)  # blocks when downstream is saturated
+        # Each worker consumed exactly one STOP; the last one out tells the next stage.
+        with self._remaining_lock:
+            self._remaining -= 1
+            last = self._remaining == 0
+        if last and self.outbox is not None:
+            self.outbox.put(STOP)
+        elif not last:
+            self.inbox.put(STOP)
+
+
+class Checkpoint:
+    def __init__(self, path: Path, flush_every: int = 25) -> None:
+        self.path = path
+        self.flush_every = flush_every
+        self.done: Set[str] = set()
+        self._pending = 0
+        self._lock = threading.Lock()
+        if path.exists():
+            self.done = set(json.loads(path.read_text(encoding="utf-8")).get("uploaded", []))
+
+    def mark(self, names: List[str]) -> None:
+        with self._lock:
+            self.done.update(names)
+            self._pending += len(names)
+            if self._pending >= self.flush_every:
+                self._write()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write()
+
+    def _write(self) -> None:
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"uploaded": sorted(self.done)}, indent=2), encoding="utf-8")
+        tmp.replace(self.path)
+        self._pending = 0
+
+
+def main() -> int:
+    args = parse_args()
+    source_dir: Path = args.source.resolve()
+    if not source_dir.exists():
+        print(f"Source directory not found: {source_dir}", file=sys.stderr)
+        return 1
+    ocr_dir: Path = (args.ocr_dir or (source_dir / "ocr")).resolve()
+    ocr_dir.mkdir(parents=True, exist_ok=True)
+    logger = build_logger(ocr_dir / "pipeline.log")
+
+    checkpoint = Checkpoint(args.checkpoint or (ocr_dir / "pipeline-checkpoint.json"))
+    if args.force:
+        checkpoint.done.clear()
+
+    images = [
+        image
+        for image in collect_images(source_dir, extensions=(".png", ".jpg", ".jpeg"))
+        if image.name not in checkpoint.done
+    ]
+    if not images:
+        logger.info("Nothing to do: all screenshots in %s are already uploaded", source_dir)
+        return 0
+
+    try:
+        from sentence_transformers import SentenceTransformer  # type: ignore
+    except ImportError:
+        print("sentence-transformers is required to embed questions.", file=sys.stderr)
+        return 1
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    from ingest_nbcot_qdrant import ensure_collection
+
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    client = QdrantClient(url=args.qdrant_url)
+    ensure_collection(client, args.collection, model.get_sentence_embedding_dimension())
+    corrector = load_corrector() if args.correct_spelling else None
+    model_lock = threading.Lock()
+
+    def ocr(batch: List[Item]) -> List[Item]:
+        done = []
+        for item in batch:
+            output = ocr_dir / f"{item.image.stem}.txt"
+            if args.force or not output.exists():
+                ok = run_tesseract(
+                    image_path=item.image,
+                    output_txt_path=output,
+                    tesseract_cmd=args.tesseract,
+                    lang=args.lang,
+                    psm=args.psm,
+                    logger=logger,
+                )
+                if not ok:
+                    continue
+            item.text = output.read_text(encoding="utf-8", errors="replace")
+            done.append(item)
+        return done
+
+    def parse(batch: List[Item]) -> List[Item]:
+        done = []
+        for item in batch:
+            item.prompt, item.options = parse_ocr_question(clean_ocr_text(item.text, corrector))
+            if item.prompt:
+                done.append(item)
+            else:
+                logger.warning("No question stem found in %s", item.image.name)
+        return done
+
+    def embed(batch: List[Item]) -> List[Item]:
+        with model_lock:
+            vectors = model.encode([item.prompt for item in batch], normalize_embeddings=True)
+        for item, vector in zip(batch, vectors):
+            item.vector = vector.tolist()
+        return batch
+
+    def upload(batch: List[Item]) -> List[Item]:
+        points = [
+            qmodels.PointStruct(
+                id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"{args.set_id}:{item.image.stem}")),
+                vector=item.vector,
+                payload={
+                    "set_id": args.set_id,
+                    "image": item.image.name,
+                    "prompt": item.prompt,
+                    "options": item.options,
+                },
+            )
+            for item in batch
+        ]
+        client.upsert(collection_name=args.collection, points=points)
+        checkpoint.mark([item.image.name for item in batch])
+        return batch
+
+    queues = [queue.Queue(maxsize=args.queue_size) for _ in range(4)]
+    stages = [
+        Stage("ocr", ocr, args.ocr_workers, 1, queues[0], queues[1], logger),
+        Stage("parse", parse, args.parse_workers, 16, queues[1], queues[2], logger),
+        Stage("embed", embed, args.embed_workers, args.embed_batch, queues[2], queues[3], logger),
+        Stage("upload", upload, args.upload_workers, args.upload_batch, queues[3], None, logger),
+    ]
+
+    logger.info("Pipeline starting: %d screenshots from %s", len(images), source_dir)
+    start = time.perf_counter()
+    for stage in stages:
+        stage.start()
+
+    def report() -> None:
+        elapsed = time.perf_counter() - start
+        parts = []
+        for stage, inbox in zip(stages, queues):
+            stats = stage.stats
+            parts.append(
+                f"{stage.name}: {stats.processed} done ({stats.processed / elapsed:.1f}/s), "
+                f"{stats.failed} failed, queue {inbox.qsize()}"
+            )
+        logger.info(" | ".join(parts))
+
+    finished = threading.Event()
+
+    def reporter() -> None:
+        while not finished.wait(args.report_every):
+            report()
+
+    threading.Thread(target=reporter, daemon=True).start()
+
+    for image in images:
+        queues[0].put(Item(image=image))  # blocks while OCR is saturated
+    queues[0].put(STOP)
+    for stage in stages:
+        stage.join()
+    finished.set()
+    checkpoint.flush()
+
+    report()
+    elapsed = time.perf_counter() - start
+    for stage in stages:
+        stats = stage.stats
+        workers = len(stage.threads)
+        utilisation = stats.busy / (elapsed * workers) if elapsed else 0.0
+        logger.info(
+            "%s: %d items, busy %.1fs across %d worker(s) (%.0f%% utilised)",
+            stage.name,
+            stats.processed,
+            stats.busy,
+            workers,
+            utilisation * 100,
+        )
+    uploaded = stages[-1].stats.processed
+    logger.info("Pipeline finished: %d of %d screenshots uploaded in %.1fs", uploaded, len(images), elapsed)
+    return 0 if uploaded == len(images) else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
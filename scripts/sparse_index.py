@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Sparse keyword index for the NBCOT source chunks.
+
+``SparseIndex`` keeps a BM25 vocabulary and a local inverted index that grow
+incrementally: each chunk is tokenised once, new terms get the next free id
+(ids are never reassigned), unchanged chunk files are skipped, and the chunks
+of changed or deleted files are removed before the file is re-indexed.
+
+Two outputs come from the index:
+
+* ``vector(doc_id)`` - the BM25 term-frequency component of an indexed chunk,
+  stored in Qdrant as the named sparse vector ``bm25`` (the collection's
+  ``IDF`` modifier applies inverse document frequency server-side). Length
+  normalisation uses the corpus average length, so ingest updates the index
+  first, deletes the points of every chunk the index dropped and only then
+  re-uploads all chunks with freshly computed vectors, so the stored vectors
+  always share one average length.
+* ``search(...)`` / ``candidate_ids(...)`` - full BM25 over the local
+  postings. Exact clinical terms (assessment names, diagnoses, OTPF codes)
+  pick a small candidate set that dense scoring can then be restricted to.
+  ``query_vector(...)`` is the matching query for a server-side sparse or
+  hybrid search against the ``bm25`` vectors.
+
+Run as a script to update the index from new chunk files, or to query it::
+
+    python scripts/sparse_index.py update
+    python scripts/sparse_index.py search "Allen Cognitive Level Screen"
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import pickle
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+from text_normalization import file_fingerprint, normalize_text
+
+DEFAULT_INDEX_PATH = Path("data/nbcot-sources/sparse_index.pkl")
+SPARSE_VECTOR_NAME = "bm25"
+INDEX_VERSION = 2
+K1 = 1.2
+B = 0.75
+
+# Keep hyphenated and dotted codes ("otpf-4", "b140.1") as single terms.
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    """
+    a about above after again all also an and any are as at be because been before being between both but by
+    can could did do does doing during each for from further had has have having he her here hers him his how
+    i if in into is it its itself may me more most my no nor not of off on once only or other our out over own
+    same she should so some such than that the their them then there these they this those through to too
+    under until up very was we were what when where which while who whom why will with would you your
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(normalize_text(text).lower()) if t not in STOPWORDS and len(t) > 1]
+
+
+class SparseIndex:
+    def __init__(self) -> None:
+        self.vocab: Dict[str, int] = {}
+        self.doc_freq: Dict[int, int] = {}
+        self.postings: Dict[int, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self.files: Dict[str, str] = {}
+        self.file_docs: Dict[str, List[str]] = {}
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def avg_length(self) -> float:
+        return self.total_length / self.num_docs if self.num_docs else 1.0
+
+    def _term_id(self, term: str) -> int:
+        term_id = self.vocab.get(term)
+        if term_id is None:
+            term_id = self.vocab[term] = len(self.vocab)
+        return term_id
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Index ``text`` under ``doc_id``, replacing any previous version of it."""
+        self.remove(doc_id)
+        counts = Counter(tokenize(text))
+        terms = {self._term_id(term): tf for term, tf in counts.items()}
+        length = sum(counts.values())
+        self.doc_terms[doc_id] = terms
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        for term_id, tf in terms.items():
+            self.postings.setdefault(term_id, {})[doc_id] = tf
+            self.doc_freq[term_id] = self.doc_freq.get(term_id, 0) + 1
+
+    def remove(self, doc_id: str) -> None:
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self.total_length -= self.doc_lengths.pop(doc_id)
+        for term_id in terms:
+            del self.postings[term_id][doc_id]
+            self.doc_freq[term_id] -= 1
+
+    def is_current(self, path: Path, fingerprint: str, doc_ids: List[str]) -> bool:
+        return self.files.get(path.name) == fingerprint and self.file_docs.get(path.name) == doc_ids
+
+    def remove_file(self, name: str) -> List[str]:
+        """Drop a chunk file's chunks; returns their doc ids."""
+        doc_ids = self.file_docs.pop(name, [])
+        for doc_id in doc_ids:
+            self.remove(doc_id)
+        self.files.pop(name, None)
+        return doc_ids
+
+    def update_file(self, path: Path, fingerprint: str, docs: List[Tuple[str, str]]) -> List[str]:
+        """Replace a chunk file's chunks with ``(doc_id, text)`` pairs; returns the doc ids it no longer has."""
+        doc_ids = [doc_id for doc_id, _ in docs]
+        removed = self.remove_file(path.name)
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+        self.files[path.name] = fingerprint
+        self.file_docs[path.name] = doc_ids
+        return sorted(set(removed) - set(doc_ids))
+
+    def vector(self, doc_id: str) -> Tuple[List[int], List[float]]:
+        """BM25 term-frequency weights of an indexed chunk, normalised by the current average length."""
+        terms = self.doc_terms[doc_id]
+        norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / self.avg_length)
+        indices = sorted(terms)
+        return indices, [terms[i] * (K1 + 1) / (terms[i] + norm) for i in indices]
+
+    def query_vector(self, text: str) -> Tuple[List[int], List[float]]:
+        """Sparse query vector: one unit weight per known term (IDF is applied by Qdrant)."""
+        indices = sorted({self.vocab[t] for t in tokenize(text) if t in self.vocab})
+        return indices, [1.0] * len(indices)
+
+    def idf(self, term_id: int) -> float:
+        df = self.doc_freq.get(term_id, 0)
+        return math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, text: str, limit: int = 100) -> List[Tuple[str, float]]:
+        """Score documents sharing at least one query term with BM25."""
+        scores: Dict[str, float] = {}
+        avg = self.avg_length
+        for term_id in {self.vocab[t] for t in tokenize(text) if t in self.vocab}:
+            idf = self.idf(term_id)
+            for doc_id, tf in self.postings.get(term_id, {}).items():
+                norm = K1 * (1 - B + B * self.doc_lengths[doc_id] / avg)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:limit]
+
+    def candidate_ids(self, text: str, limit: int = 200) -> List[str]:
+        """Point ids to restrict dense search to (empty when no query term is known)."""
+        return [doc_id for doc_id, _ in self.search(text, limit)]
+
+    def save(self, path: Path = DEFAULT_INDEX_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("wb") as f:
+            pickle.dump({"version": INDEX_VERSION, **self.__dict__}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = DEFAULT_INDEX_PATH) -> "SparseIndex":
+        index = cls()
+        if not path.exists():
+            return index
+        with path.open("rb") as f:
+            state = pickle.load(f)
+        if state.pop("version", None) != INDEX_VERSION:
+            print(f"Sparse index {path} was written by another version; rebuilding it.")
+            return index
+        index.__dict__.update(state)
+        return index
+
+
+def update_from_files(index: SparseIndex, files: Iterable[Path]) -> Tuple[int, List[str]]:
+    """Bring the index in line with ``files``.
+
+    Chunks of files that are no longer present are dropped, and a changed file
+    replaces all of its previous chunks. Returns the number of chunks
+    (re)indexed and the ids of chunks that are no longer indexed, whose points
+    must be deleted from the collection.
+    """
+    from ingest_nbcot_qdrant import chunk_point_id, load_chunks
+
+    files = list(files)
+    stale = set(index.files) - {path.name for path in files}
+    changed = []
+    # Mirrors the running counter ingest uses for chunks without a usable id.
+    processed = 0
+    for path in files:
+        _, chunks = load_chunks(path)
+        docs = []
+        for chunk in chunks:
+            if not chunk.get("text"):
+                continue
+            docs.append((chunk_point_id(path, chunk, processed), chunk["text"]))
+            processed += 1
+        fingerprint = file_fingerprint(path)
+        if not index.is_current(path, fingerprint, [doc_id for doc_id, _ in docs]):
+            changed.append((path, fingerprint, docs))
+
+    # Counter-based ids shift between files when an earlier file changes, so
+    # every outdated chunk is dropped before any replacement is indexed.
+    removed = set()
+    for name in stale | {path.name for path, _, _ in changed}:
+        removed.update(index.remove_file(name))
+    for path, fingerprint, docs in changed:
+        index.update_file(path, fingerprint, docs)
+    return sum(len(docs) for _, _, docs in changed), sorted(removed - index.doc_lengths.keys())
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--index",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="Sparse index file (default: %(default)s)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    update = subparsers.add_parser("update", help="Index new or changed *_chunks.json files and drop deleted ones.")
+    update.add_argument("--data-dir", type=Path, default=Path("data/nbcot-sources"))
+    search = subparsers.add_parser("search", help="Run a BM25 query against the local index.")
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=10)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    index = SparseIndex.load(args.index)
+    start = time.perf_counter()
+    if args.command == "update":
+        from ingest_nbcot_qdrant import iter_chunk_files
+
+        added, removed = update_from_files(index, iter_chunk_files(args.data_dir))
+        index.save(args.index)
+        print(
+            f"Re-indexed {added} chunks and dropped {len(removed)} in {time.perf_counter() - start:.2f}s; "
+            f"{index.num_docs} chunks, {len(index.vocab)} terms -> {args.index}"
+        )
+        return
+    for doc_id, score in index.search(args.query, args.limit):
+        print(f"{score:8.3f}  {doc_id}")
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
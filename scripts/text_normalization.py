@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Shared text normalisation and OCR spelling correction for NBCOT content.
+
+``normalize_text`` folds a string with NFKC and then maps typographic
+punctuation to ASCII through a single ``str.translate`` table, replacing the
+per-character ``str.replace`` loops the parsing scripts used to run.
+
+``SpellCorrector`` is a SymSpell-style symmetric-delete corrector. Its
+dictionary is built from the ``*_extracted.txt`` source corpus (plus the
+proofread published question sets) and persisted as a pickled delete index
+together with the size and mtime of every source file, so scripts only pay
+the build cost again when the corpus changes. It also splits run-together OCR
+tokens ("Anillustrated" -> "An illustrated") when both halves are known words.
+
+Run as a script to (re)build the index::
+
+    python scripts/text_normalization.py --data-dir data/nbcot-sources
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import pickle
+import re
+import time
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_DATA_DIR = Path("data/nbcot-sources")
+DEFAULT_INDEX_PATH = DEFAULT_DATA_DIR / "symspell_index.pkl"
+# Published question sets, located relative to the corpus directory so the
+# index is the same whichever directory a script is run from.
+QUESTION_DIR_FROM_DATA_DIR = Path("../../src/data/practice-tests")
+INDEX_VERSION = 2
+
+# Applied after NFKC, which already folds ligatures, full-width forms and
+# non-breaking spaces; this covers the punctuation NFKC leaves alone.
+TRANSLATION_TABLE = str.maketrans(
+    {
+        "\u2018": "'",
+        "\u2019": "'",
+        "\u201a": "'",
+        "\u201b": "'",
+        "\u2032": "'",
+        "\u201c": '"',
+        "\u201d": '"',
+        "\u201e": '"',
+        "\u2033": '"',
+        "\u2010": "-",
+        "\u2011": "-",
+        "\u2012": "-",
+        "\u2013": "-",
+        "\u2014": "-",
+        "\u2015": "-",
+        "\u2212": "-",
+        "\u2022": "-",
+        "\u00a0": " ",
+        "\u200b": None,
+        "\ufeff": None,
+        "\ufffd": "'",
+    }
+)
+
+WORD_PATTERN = re.compile(r"[A-Za-z]+")
+# Answer options as OCR'd: a bubble glyph or a lettered label, then the text.
+OPTION_MARKER = r"(?:[O0o\u00a9\u00ae@\u2022*\-]|\(?[A-E][\).:])\)?\s+"
+OPTION_LINE_PATTERN = re.compile(rf"^{OPTION_MARKER}\S")
+OPTION_START_PATTERN = re.compile(rf"^\s*{OPTION_MARKER}")
+
+# OCR of answer bubbles tends to fuse the leading article onto the option text,
+# so splits are only tried on the first word of an option line.
+SPLIT_PREFIXES = ("an", "a", "the")
+MIN_CORRECTION_LENGTH = 6
+MIN_SPLIT_LENGTH = 8
+MIN_SPLIT_REMAINDER = 6
+# Single-occurrence corpus words are often PDF hyphenation fragments ("tured").
+MIN_CANDIDATE_COUNT = 3
+
+# (input, expected) pairs reported by ``--check`` after every build.
+SANITY_CHECKS = (
+    ("\u00a9 Anillustrated communication board", "\u00a9 An illustrated communication board"),
+    ("O Awnritten schedule placed in the bedroom", "O A written schedule placed in the bedroom"),
+    ("has had no atypical illnesses since birth", "has had no atypical illnesses since birth"),
+    ("\u00a9 Atypical presentation of symptoms", "\u00a9 Atypical presentation of symptoms"),
+)
+
+
+def normalize_text(value: str) -> str:
+    """NFKC-fold ``value`` and map typographic punctuation to ASCII."""
+    return unicodedata.normalize("NFKC", value).translate(TRANSLATION_TABLE)
+
+
+def damerau_levenshtein(a: str, b: str, max_distance: int) -> int:
+    """Optimal string alignment distance, or ``max_distance + 1`` if exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+            row_min = min(row_min, current[j])
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[len(b)]
+
+
+def edits(word: str, distance: int, max_distance: int, out: set) -> set:
+    if distance >= max_distance or len(word) <= 1:
+        return out
+    for i in range(len(word)):
+        deleted = word[:i] + word[i + 1 :]
+        if deleted not in out:
+            out.add(deleted)
+            edits(deleted, distance + 1, max_distance, out)
+    return out
+
+
+class SpellCorrector:
+    """Symmetric-delete spelling corrector over a word-frequency dictionary."""
+
+    def __init__(self, max_edit_distance: int = 2, prefix_length: int = 7, min_count: int = 1) -> None:
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.min_count = min_count
+        self.words: Dict[str, int] = {}
+        self.deletes: Dict[str, List[str]] = {}
+        self.sources: Dict[str, str] = {}
+        self._memo: Dict[Tuple[str, bool], str] = {}
+
+    def _deletes_for(self, word: str, max_distance: Optional[int] = None) -> set:
+        prefix = word[: self.prefix_length]
+        out = {prefix}
+        return edits(prefix, 0, self.max_edit_distance if max_distance is None else max_distance, out)
+
+    def build(self, counts: Counter) -> "SpellCorrector":
+        self.words = {w: c for w, c in counts.items() if c >= self.min_count}
+        deletes: Dict[str, List[str]] = {}
+        for word in self.words:
+            for key in self._deletes_for(word):
+                deletes.setdefault(key, []).append(word)
+        self.deletes = deletes
+        return self
+
+    @classmethod
+    def from_corpus(cls, paths: Iterable[Path], **kwargs) -> "SpellCorrector":
+        paths = list(paths)
+        counts: Counter = Counter()
+        for path in paths:
+            raw = path.read_text(encoding="utf-8", errors="replace")
+            if path.suffix == ".json":
+                raw = "\n".join(iter_question_text(json.loads(raw)))
+            counts.update(w.lower() for w in WORD_PATTERN.findall(normalize_text(raw)))
+        corrector = cls(**kwargs).build(counts)
+        corrector.sources = source_fingerprints(paths)
+        return corrector
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {
+            "version": INDEX_VERSION,
+            "max_edit_distance": self.max_edit_distance,
+            "prefix_length": self.prefix_length,
+            "min_count": self.min_count,
+            "words": self.words,
+            "deletes": self.deletes,
+            "sources": self.sources,
+        }
+        with path.open("wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: Path) -> "SpellCorrector":
+        with path.open("rb") as f:
+            state = pickle.load(f)
+        if state.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported spelling index version in {path}")
+        corrector = cls(state["max_edit_distance"], state["prefix_length"], state["min_count"])
+        corrector.words = state["words"]
+        corrector.deletes = state["deletes"]
+        corrector.sources = state["sources"]
+        return corrector
+
+    def lookup(self, word: str, max_distance: Optional[int] = None) -> Optional[str]:
+        """Return the closest, most frequent dictionary word for a lowercase ``word``."""
+        if word in self.words:
+            return word
+        max_distance = self.max_edit_distance if max_distance is None else max_distance
+        best: Optional[str] = None
+        best_key = (max_distance + 1, 0)
+        for key in self._deletes_for(word, max_distance):
+            for candidate in self.deletes.get(key, ()):
+                distance = damerau_levenshtein(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                rank = (distance, -self.words[candidate])
+                if rank < best_key:
+                    best, best_key = candidate, rank
+        return best
+
+    def split(self, word: str) -> Optional[List[str]]:
+        """Split an article fused onto the next word ("anillustrated" -> "an illustrated")."""
+        for left in SPLIT_PREFIXES:
+            right = word[len(left) :]
+            if not word.startswith(left) or len(right) < MIN_SPLIT_REMAINDER:
+                continue
+            # "a" + a known word is usually a real word ("atypical", "apolitical"), so only repairs count.
+            if left != "a" and self.words.get(right, 0) >= MIN_CANDIDATE_COUNT:
+                return [left, right]
+            candidate = self.lookup(right, max_distance=1)
+            if candidate is not None and self.is_repair(right, candidate):
+                return [left, candidate]
+        return None
+
+    def correct_word(self, token: str, allow_split: bool = False) -> str:
+        """Correct a single token, leaving known words, acronyms and short tokens alone.
+
+        Only high-confidence OCR repairs are applied: a stray character inserted
+        inside a word ("wnritten") or, when ``allow_split`` is set, an article
+        fused onto the following word. Substitutions are never applied because
+        the corpus vocabulary is too small to tell a rare clinical term from a
+        misread one.
+        """
+        key = (token, allow_split)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        lower = token.lower()
+        replacement: Optional[str] = None
+        if len(lower) >= MIN_CORRECTION_LENGTH and lower not in self.words and token[1:] == token[1:].lower():
+            candidate = self.lookup(lower, max_distance=1)
+            if candidate is not None and self.is_repair(lower, candidate):
+                replacement = candidate
+            elif allow_split and len(lower) >= MIN_SPLIT_LENGTH:
+                parts = self.split(lower)
+                if parts:
+                    replacement = " ".join(parts)
+        if replacement is None:
+            result = token
+        elif token[0].isupper():
+            result = replacement[0].upper() + replacement[1:]
+        else:
+            result = replacement
+        self._memo[key] = result
+        return result
+
+    def is_repair(self, token: str, candidate: str) -> bool:
+        return self.words[candidate] >= MIN_CANDIDATE_COUNT and is_interior_insertion(token, candidate)
+
+    def correct_line(self, line: str) -> str:
+        marker = OPTION_START_PATTERN.match(line)
+        first = WORD_PATTERN.match(line, marker.end()) if marker else None
+        split_at = first.start() if first else -1
+        return WORD_PATTERN.sub(lambda m: self.correct_word(m.group(0), m.start() == split_at), line)
+
+    def correct(self, text: str) -> str:
+        return "\n".join(self.correct_line(line) for line in text.split("\n"))
+
+
+def is_interior_insertion(token: str, candidate: str) -> bool:
+    """True when ``token`` is ``candidate`` with one extra character not at either end.
+
+    Dropping the first or last character would turn plurals and inflections
+    ("weights", "resides") into their stems, which is not an OCR error.
+    """
+    if len(token) != len(candidate) + 1:
+        return False
+    return any(token[:i] + token[i + 1 :] == candidate for i in range(1, len(token) - 1))
+
+
+def iter_question_text(data: object) -> Iterator[str]:
+    """Yield the reviewed prose (prompt, options, rationale) of a questions.json list."""
+    for item in data if isinstance(data, list) else []:
+        yield item.get("prompt") or ""
+        yield item.get("content") or ""
+        for option in item.get("options") or []:
+            yield option.get("label") or ""
+
+
+def file_fingerprint(path: Path) -> str:
+    stat = path.stat()
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+def source_fingerprints(paths: Iterable[Path]) -> Dict[str, str]:
+    return {str(path.resolve()): file_fingerprint(path) for path in paths}
+
+
+def corpus_sources(data_dir: Path = DEFAULT_DATA_DIR, question_dir: Optional[Path] = None) -> List[Path]:
+    sources = sorted(data_dir.glob("*_extracted.txt"))
+    if not sources:
+        raise FileNotFoundError(f"No *_extracted.txt files found in {data_dir}")
+    # Published practice sets are proofread, so their vocabulary keeps everyday
+    # words that the textbooks happen not to use from being "corrected".
+    question_dir = (question_dir or data_dir / QUESTION_DIR_FROM_DATA_DIR).resolve()
+    questions = sorted(question_dir.glob("*/questions.json"))
+    if not questions:
+        print(f"Warning: no */questions.json under {question_dir}; the index will miss the question-set vocabulary.")
+    return sources + questions
+
+
+def build_index(
+    data_dir: Path = DEFAULT_DATA_DIR,
+    index_path: Path = DEFAULT_INDEX_PATH,
+    question_dir: Optional[Path] = None,
+) -> SpellCorrector:
+    corrector = SpellCorrector.from_corpus(corpus_sources(data_dir, question_dir))
+    corrector.save(index_path)
+    return corrector
+
+
+@lru_cache(maxsize=None)
+def load_corrector(
+    index_path: Path = DEFAULT_INDEX_PATH,
+    data_dir: Path = DEFAULT_DATA_DIR,
+    question_dir: Optional[Path] = None,
+) -> SpellCorrector:
+    """Load the persisted index, (re)building it when missing or when the corpus has changed."""
+    if index_path.exists():
+        try:
+            corrector = SpellCorrector.load(index_path)
+        except ValueError:  # written by an older INDEX_VERSION
+            corrector = None
+        try:
+            current = source_fingerprints(corpus_sources(data_dir, question_dir))
+        except FileNotFoundError:
+            current = None  # corpus not checked out here; the persisted index is all there is
+        if corrector is not None and (current is None or corrector.sources == current):
+            return corrector
+        print(f"Spelling index {index_path} is out of date; rebuilding.")
+    return build_index(data_dir, index_path, question_dir)
+
+
+def clean_ocr_text(value: str, corrector: Optional[SpellCorrector] = None) -> str:
+    """Normalise OCR output and, when a corrector is given, fix garbled words."""
+    value = normalize_text(value.replace("\r\n", "\n"))
+    return corrector.correct(value) if corrector is not None else value
+
+
+def collapse(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def is_header_noise(line: str) -> bool:
+    return (
+        line.startswith("=")
+        or re.match(r"^page\s+", line, re.IGNORECASE) is not None
+        or re.search(r"section\s+\d+", line, re.IGNORECASE) is not None
+        or re.match(r"^[0-9O]{3,}\b", line) is not None
+        or len(line) <= 2
+    )
+
+
+def stem_from_ocr(raw: str) -> str:
+    """Return the question stem of an OCR transcript (text before the first option)."""
+    lines: List[str] = []
+    for line in raw.splitlines():
+        stripped = line.strip().rstrip("|").strip()
+        if not stripped or is_header_noise(stripped):
+            continue
+        if lines and OPTION_LINE_PATTERN.match(stripped):
+            break
+        lines.append(stripped)
+    return collapse(" ".join(lines))
+
+
+def parse_ocr_question(text: str) -> tuple[str, List[str]]:
+    """Split an OCR transcript into its stem and answer option labels."""
+    prompt = stem_from_ocr(text)
+    options: List[str] = []
+    in_options = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped or is_header_noise(stripped):
+            continue
+        if OPTION_LINE_PATTERN.match(stripped):
+            in_options = True
+            label = stripped.split(None, 1)[1] if " " in stripped else stripped
+            if re.search(r"[a-z]{3}", label):  # skip answer-bubble noise such as "OO©O6O0"
+                options.append(label)
+        elif in_options:
+            break
+    return prompt, options
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=DEFAULT_DATA_DIR,
+        help="Directory containing *_extracted.txt corpus files (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--question-dir",
+        type=Path,
+        default=None,
+        help=(
+            "Directory of */questions.json sets to add to the dictionary "
+            f"(default: <data-dir>/{QUESTION_DIR_FROM_DATA_DIR})"
+        ),
+    )
+    parser.add_argument(
+        "--index",
+        type=Path,
+        default=DEFAULT_INDEX_PATH,
+        help="Where to write the spelling index (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--check",
+        nargs="*",
+        default=[],
+        help="Extra words or phrases to correct after building; the built-in SANITY_CHECKS always run.",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    start = time.perf_counter()
+    corrector = build_index(args.data_dir, args.index, args.question_dir)
+    print(
+        f"Built spelling index with {len(corrector.words)} words and {len(corrector.deletes)} delete keys "
+        f"in {time.perf_counter() - start:.2f}s -> {args.index}"
+    )
+    failures = 0
+    for phrase, expected in SANITY_CHECKS:
+        result = corrector.correct(normalize_text(phrase))
+        failures += result != expected
+        print(f"  {'ok' if result == expected else 'FAIL':<4} {phrase!r} -> {result!r}")
+    for phrase in args.check:
+        print(f"  {phrase!r} -> {corrector.correct(normalize_text(phrase))!r}")
+    if failures:
+        raise SystemExit(f"{failures} sanity check(s) failed.")
+
+
+if __name__ == "__main__":
+    main()
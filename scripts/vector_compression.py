@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Compact vector storage for the NBCOT source collection.
+
+``VectorProjection`` fits PCA on the chunk embeddings with NumPy and is saved
+as an ``.npz`` file so that ingest and query code project vectors the same
+way. It also carries the global value range used for the ``uint8`` encoding.
+
+The projection is an uncentred SVD of the unit-normalised embeddings: inner
+products of projected vectors approximate the original cosine similarities,
+whereas mean-centring would add a per-document bias to every score. Projected
+vectors are therefore stored with Dot distance and are not re-normalised.
+
+Supported encodings (the Qdrant ``datatype`` of the stored vectors):
+
+* ``float32`` - unchanged.
+* ``float16`` - half precision.
+* ``uint8``   - one shared affine scale for every dimension, Euclid distance.
+  A single scale preserves the Euclidean ranking of the projected vectors,
+  but those are not unit length (only the inputs are normalised), so Euclidean
+  ranking only approximates cosine ranking. On the 206 embedded chunks, with
+  the PCA fitted without the held-out queries, recall@10 against exact cosine
+  search was 0.954 at 128d (float32: 0.959), 0.885 at 64d (float32: 0.910)
+  and 0.990 at the full 384d.
+
+Usage::
+
+    python scripts/vector_compression.py fit --dim 128
+    python scripts/vector_compression.py check --projection data/nbcot-sources/pca_128.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+DATATYPES = ("float32", "float16", "uint8")
+UINT8_MAX = 255
+
+
+@dataclass
+class VectorProjection:
+    components: Optional[np.ndarray]
+    lo: float
+    hi: float
+    input_dim: int
+
+    @property
+    def dim(self) -> int:
+        return self.input_dim if self.components is None else int(self.components.shape[0])
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray, dim: Optional[int] = None) -> "VectorProjection":
+        """Fit PCA to ``dim`` components (``None`` keeps the full dimension)."""
+        vectors = normalise_rows(np.asarray(vectors, dtype=np.float32))
+        components: Optional[np.ndarray] = None
+        if dim is not None and dim < vectors.shape[1]:
+            if dim > len(vectors):
+                raise ValueError(f"Cannot fit {dim} components on {len(vectors)} vectors.")
+            _, _, vt = np.linalg.svd(vectors, full_matrices=False)
+            components = vt[:dim].astype(np.float32)
+        projection = cls(components=components, lo=-1.0, hi=1.0, input_dim=vectors.shape[1])
+        projected = projection.transform(vectors)
+        projection.lo, projection.hi = float(projected.min()), float(projected.max())
+        return projection
+
+    def explained_variance(self, vectors: np.ndarray) -> float:
+        if self.components is None:
+            return 1.0
+        vectors = normalise_rows(np.asarray(vectors, dtype=np.float32))
+        total = float((vectors**2).sum())
+        kept = float(((vectors @ self.components.T) ** 2).sum())
+        return kept / total if total else 1.0
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        """Normalise to unit length and project when PCA is fitted."""
+        vectors = normalise_rows(np.asarray(vectors, dtype=np.float32))
+        if self.components is not None:
+            vectors = vectors @ self.components.T
+        return vectors
+
+    def encode(self, vectors: np.ndarray, datatype: str) -> np.ndarray:
+        """Encode projected vectors for storage as ``datatype``."""
+        if datatype == "float32":
+            return vectors.astype(np.float32)
+        if datatype == "float16":
+            return vectors.astype(np.float16)
+        if datatype == "uint8":
+            scaled = (np.clip(vectors, self.lo, self.hi) - self.lo) / (self.hi - self.lo) * UINT8_MAX
+            return np.rint(scaled).astype(np.uint8)
+        raise ValueError(f"Unsupported vector datatype: {datatype}")
+
+    def prepare(self, vectors: np.ndarray, datatype: str) -> np.ndarray:
+        return self.encode(self.transform(vectors), datatype)
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {"lo": np.float32(self.lo), "hi": np.float32(self.hi), "input_dim": np.int32(self.input_dim)}
+        if self.components is not None:
+            arrays["components"] = self.components
+        with path.open("wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: Path) -> "VectorProjection":
+        with np.load(path) as data:
+            return cls(
+                components=data["components"] if "components" in data else None,
+                lo=float(data["lo"]),
+                hi=float(data["hi"]),
+                input_dim=int(data["input_dim"]),
+            )
+
+
+def normalise_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def distance_for(datatype: str, projection: Optional[VectorProjection] = None) -> str:
+    """Qdrant distance that preserves cosine ranking for the given encoding."""
+    if datatype == "uint8":
+        return "Euclid"
+    if projection is not None and projection.components is not None:
+        return "Dot"
+    return "Cosine"
+
+
+def bytes_per_vector(dim: int, datatype: str) -> int:
+    return dim * np.dtype(datatype).itemsize
+
+
+def load_embeddings(data_dir: Path) -> np.ndarray:
+    from ingest_nbcot_qdrant import iter_chunk_files, load_chunks  # ingest imports this module
+
+    vectors: List[List[float]] = []
+    for path in iter_chunk_files(data_dir):
+        _, chunks = load_chunks(path)
+        vectors.extend(chunk["embedding"] for chunk in chunks if chunk.get("embedding"))
+    if not vectors:
+        raise SystemExit(f"No chunk embeddings found in {data_dir}")
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-scores, axis=1, kind="stable")[:, :k]
+
+
+def recall_check(
+    vectors: np.ndarray, projection: VectorProjection, datatype: str, k: int, num_queries: int, seed: int
+) -> float:
+    """Recall@k of the encoded corpus against exact cosine search on the full vectors.
+
+    The held-out queries must not inform the PCA, so a projection of the same
+    dimension is refitted on the remaining vectors before encoding.
+    """
+    full = normalise_rows(vectors)
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(full))
+    queries, corpus = full[order[:num_queries]], full[order[num_queries:]]
+    truth = top_k(queries @ corpus.T, k)
+    if projection.components is not None:
+        projection = VectorProjection.fit(corpus, projection.dim)
+
+    encoded = projection.prepare(corpus, datatype).astype(np.float32)
+    encoded_queries = projection.prepare(queries, datatype).astype(np.float32)
+    if datatype == "uint8":
+        # Ranking by squared Euclidean distance; the |q|^2 term is constant per query.
+        scores = 2 * encoded_queries @ encoded.T - (encoded**2).sum(axis=1)
+    else:
+        scores = encoded_queries @ encoded.T
+    found = top_k(scores, k)
+    hits = sum(len(set(a.tolist()) & set(b.tolist())) for a, b in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        default=Path("data/nbcot-sources"),
+        help="Directory containing *_chunks.json files (default: %(default)s)",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fit = subparsers.add_parser("fit", help="Fit and save a projection.")
+    fit.add_argument(
+        "--dim", type=int, default=128, help="PCA components; 0 keeps the full dimension (default: %(default)s)"
+    )
+    fit.add_argument("--output", type=Path, default=None, help="Defaults to <data-dir>/pca_<dim>.npz")
+
+    check = subparsers.add_parser(
+        "check",
+        help="Report held-out recall of each encoding against the full vectors (PCA refitted without the queries).",
+    )
+    check.add_argument("--projection", type=Path, required=True, help="Projection file written by 'fit'.")
+    check.add_argument("--k", type=int, default=10, help="Recall cutoff (default: %(default)s)")
+    check.add_argument("--num-queries", type=int, default=50, help="Held-out query vectors (default: %(default)s)")
+    check.add_argument("--seed", type=int, default=7, help="Sampling seed (default: %(default)s)")
+    check.add_argument("--json", action="store_true", help="Also print the results as JSON.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    vectors = load_embeddings(args.data_dir)
+
+    if args.command == "fit":
+        projection = VectorProjection.fit(vectors, args.dim or None)
+        output = args.output or (args.data_dir / f"pca_{projection.dim}.npz")
+        projection.save(output)
+        print(
+            f"Fitted {vectors.shape[1]}d -> {projection.dim}d on {len(vectors)} vectors "
+            f"(explained variance {projection.explained_variance(vectors):.3f}); saved to {output}"
+        )
+        return
+
+    projection = VectorProjection.load(args.projection)
+    num_queries = min(args.num_queries, len(vectors) // 5)
+    baseline = bytes_per_vector(projection.input_dim, "float32")
+    rows = []
+    for datatype in DATATYPES:
+        recall = recall_check(vectors, projection, datatype, args.k, num_queries, args.seed)
+        size = bytes_per_vector(projection.dim, datatype)
+        rows.append(
+            {
+                "dim": projection.dim,
+                "datatype": datatype,
+                "bytes_per_vector": size,
+                "compression": round(baseline / size, 2),
+                f"recall@{args.k}": round(recall, 4),
+            }
+        )
+        print(
+            f"{projection.dim:>4}d {datatype:<8} {size:>6} B/vector ({baseline / size:4.1f}x)  "
+            f"recall@{args.k}={recall:.4f}"
+        )
+    if args.json:
+        print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()